@@ -1,11 +1,17 @@
 import asyncio
 import logging
 import os
+import time
 import aiohttp
 from livekit import rtc, api
 from livekit.agents import stt
-from livekit.plugins import google, noise_cancellation
+from livekit.plugins import google
 from dotenv import load_dotenv
+from transcript_publisher import TranscriptPublisher
+from model_registry import registry
+from frame_pipeline import FramePipeline, DROP_OLDEST, NEVER_DROP
+from recorder import MmapRecorder, recording_dir
+from stt_pool import WarmStreamPool, STTSession
 
 load_dotenv()
 
@@ -14,18 +20,36 @@ logger = logging.getLogger("manual-agent")
 
 ROOM_NAME = "my-room"
 
+# Frame queues between ingestion and each consumer (frames are 10 ms)
+ECHO_QUEUE_FRAMES = 5        # ~50 ms; older echo frames are dropped
+STT_QUEUE_FRAMES = 1000      # ~10 s; STT never drops, ingestion waits instead
+RECORD_QUEUE_FRAMES = 500   # The recorder only enqueues, so this never fills up
+
+RECORD_DIR = os.getenv("RECORD_DIR")   # Set to record each track (see recorder.py)
+
+# Streaming sessions kept open ahead of track subscriptions
+STT_POOL_SIZE = 2
+
 async def main():
     agent_source = rtc.AudioSource(48000, 1)
     agent_track = rtc.LocalAudioTrack.create_audio_track("denoised_output", agent_source)
 
     async with aiohttp.ClientSession() as http_session:
         room = rtc.Room()
+        publisher = TranscriptPublisher(room).start()
+
+        # One provider for the whole process, with sessions opened up front
+        stt_provider = registry.stt("google", lambda: google.STT(
+            languages=["en-US"],
+            detect_language=False,
+        ))
+        stt_pool = WarmStreamPool(stt_provider, size=STT_POOL_SIZE).start()
 
         @room.on("track_subscribed")
         def on_track_subscribed(track, publication, participant):
             if track.kind == rtc.TrackKind.KIND_AUDIO and participant.identity != "python-agent":
                 logger.info(f"Detected audio from {participant.identity}")
-                asyncio.create_task(process_track(track, room, agent_source))
+                asyncio.create_task(process_track(track, participant.identity, publisher, stt_pool, agent_source, time.perf_counter()))
 
         token = api.AccessToken(
             os.getenv("LIVEKIT_API_KEY"),
@@ -40,53 +64,86 @@ async def main():
             logger.info("Agent Connected! Waiting for user audio...")
         except Exception as e:
             logger.error(f"Failed to connect: {e}")
+            await stt_pool.aclose()
             return
 
         await room.local_participant.publish_track(agent_track)
 
         await asyncio.Event().wait()
 
-async def process_track(track, room, audio_source):
-
-    stt_provider = google.STT(
-        languages=["en-US"],
-        detect_language=False,
-    )
-    
-    stt_stream = stt_provider.stream()
-    
+async def process_track(track, participant_identity, publisher, stt_pool, audio_source, subscribed_at):
     clean_stream = rtc.AudioStream(
         track,
-        noise_cancellation=noise_cancellation.BVC()
+        noise_cancellation=registry.bvc()
     )
+    logger.info(f"Models: {registry.stats()}")
+
+    # Optional raw recording; Google's word timings are on the same audio clock
+    recording = None
+    if RECORD_DIR:
+        recording = MmapRecorder(recording_dir(RECORD_DIR, participant_identity, track.sid))
+
+    # Recorder time at which the current STT stream's clock starts
+    stream_origin = 0.0
+
+    def on_connect(stream):
+        nonlocal stream_origin
+        stream_origin = (recording.duration if recording is not None else 0.0) - stream.keepalive_seconds
+
+    # Already connected unless the pool ran dry; reconnects if the stream drops
+    stt_session = await STTSession(stt_pool, on_connect=on_connect).start()
 
     async def handle_stt():
         print("Google STT Listener started")
-        async for event in stt_stream:
+        first_transcript = True
+        async for event in stt_session:
+            if first_transcript and event.type in (stt.SpeechEventType.INTERIM_TRANSCRIPT, stt.SpeechEventType.FINAL_TRANSCRIPT) and event.alternatives[0].text:
+                first_transcript = False
+                stt_pool.report_first_transcript(time.perf_counter() - subscribed_at, stt_session.warm)
+
             # Google calls these "interim" results "is_final=False" internally,
             # but LiveKit maps them to INTERIM_TRANSCRIPT for us.
             if event.type == stt.SpeechEventType.INTERIM_TRANSCRIPT:
                 print(f"   (speaking): {event.alternatives[0].text}", end="\r")
+                publisher.interim(participant_identity, event.alternatives[0].text)
             elif event.type == stt.SpeechEventType.FINAL_TRANSCRIPT:
                 text = event.alternatives[0].text
                 logger.info(f"FINAL: {text}")
-                await room.local_participant.publish_data(text, reliable=True)
+                if recording is not None and event.alternatives[0].end_time:
+                    recording.mark_utterance(
+                        stream_origin + event.alternatives[0].start_time,
+                        stream_origin + event.alternatives[0].end_time,
+                    )
+                publisher.final(participant_identity, text)
+
+    stt_task = asyncio.create_task(handle_stt())
+
+    # 1. Send clean audio to Google
+    async def push_to_stt(frame):
+        stt_session.push_frame(frame)
+
+    # 2. Play clean audio back to room
+    async def play(frame):
+        await audio_source.capture_frame(frame)
+
+    pipeline = FramePipeline(clean_stream, name=participant_identity)
+    pipeline.add_consumer("stt", push_to_stt, maxsize=STT_QUEUE_FRAMES, policy=NEVER_DROP)
+    pipeline.add_consumer("echo", play, maxsize=ECHO_QUEUE_FRAMES, policy=DROP_OLDEST)
 
-    asyncio.create_task(handle_stt())
+    if recording is not None:
+        pipeline.add_consumer("record", recording, maxsize=RECORD_QUEUE_FRAMES, policy=NEVER_DROP)
 
     try:
         logger.info("Audio Pipeline Started")
-        async for event in clean_stream:
-            # 1. Send clean audio to Google
-            stt_stream.push_frame(event.frame)
-            
-            # 2. Play clean audio back to room
-            await audio_source.capture_frame(event.frame)
-                
+        await pipeline.run()
     except Exception as e:
         logger.error(f"Error in loop: {e}")
     finally:
-        await stt_stream.aclose()
+        stt_task.cancel()
+        await stt_session.aclose()
+        logger.info(f"STT pool: {stt_pool.stats()}")
+        if recording is not None:
+            await asyncio.to_thread(recording.close)
 
 if __name__ == "__main__":
     try:
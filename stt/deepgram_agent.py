@@ -1,11 +1,15 @@
 import asyncio
 import logging
 import os
+import time
 import aiohttp
 from livekit import rtc, api
 from livekit.agents import stt
-from livekit.plugins import deepgram, noise_cancellation
+from livekit.plugins import deepgram
 from dotenv import load_dotenv
+from transcript_publisher import TranscriptPublisher
+from model_registry import registry
+from stt_pool import WarmStreamPool, STTSession
 
 load_dotenv()
 
@@ -13,18 +17,33 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("manual-agent")
 ROOM_NAME = "my-room"
 
+# Streaming sessions kept open ahead of track subscriptions
+STT_POOL_SIZE = 2
+# Point at a local fake streaming server to test without the real API
+DEEPGRAM_BASE_URL = os.getenv("DEEPGRAM_BASE_URL")
+
 async def main():
     agent_source = rtc.AudioSource(48000, 1)
     agent_track = rtc.LocalAudioTrack.create_audio_track("denoised_output", agent_source)
 
     async with aiohttp.ClientSession() as http_session:
         room = rtc.Room()
+        publisher = TranscriptPublisher(room).start()
+
+        # One provider for the whole process, with sessions opened up front
+        options = {"base_url": DEEPGRAM_BASE_URL} if DEEPGRAM_BASE_URL else {}
+        stt_provider = registry.stt("deepgram", lambda: deepgram.STT(
+            model="nova-2", 
+            http_session=http_session,
+            **options
+        ))
+        stt_pool = WarmStreamPool(stt_provider, size=STT_POOL_SIZE).start()
 
         @room.on("track_subscribed")
         def on_track_subscribed(track, publication, participant):
             if track.kind == rtc.TrackKind.KIND_AUDIO and participant.identity != "python-agent":
                 logger.info(f"Detected audio from {participant.identity}")
-                asyncio.create_task(process_track(track, room, http_session, agent_source))
+                asyncio.create_task(process_track(track, participant.identity, publisher, stt_pool, agent_source, time.perf_counter()))
 
         token = api.AccessToken(
             os.getenv("LIVEKIT_API_KEY"),
@@ -39,46 +58,53 @@ async def main():
             logger.info("Agent Connected! Waiting for user audio...")
         except Exception as e:
             logger.error(f"Failed to connect: {e}")
+            await stt_pool.aclose()
             return
 
         await room.local_participant.publish_track(agent_track)
 
         await asyncio.Event().wait()
 
-async def process_track(track, room, http_session, audio_source):
-    stt_provider = deepgram.STT(
-        model="nova-2", 
-        http_session=http_session
-    )
-    stt_stream = stt_provider.stream()
+async def process_track(track, participant_identity, publisher, stt_pool, audio_source, subscribed_at):
+    # Already connected unless the pool ran dry; reconnects if the stream drops
+    stt_session = await STTSession(stt_pool).start()
     
     clean_stream = rtc.AudioStream(
         track,
-        noise_cancellation=noise_cancellation.BVC()
+        noise_cancellation=registry.bvc()
     )
+    logger.info(f"Models: {registry.stats()}")
 
     async def handle_stt():
         print("STT Listener started")
-        async for event in stt_stream:
+        first_transcript = True
+        async for event in stt_session:
+            if first_transcript and event.type in (stt.SpeechEventType.INTERIM_TRANSCRIPT, stt.SpeechEventType.FINAL_TRANSCRIPT) and event.alternatives[0].text:
+                first_transcript = False
+                stt_pool.report_first_transcript(time.perf_counter() - subscribed_at, stt_session.warm)
+
             if event.type == stt.SpeechEventType.INTERIM_TRANSCRIPT:
                 print(f"   (speaking): {event.alternatives[0].text}", end="\r")
+                publisher.interim(participant_identity, event.alternatives[0].text)
             elif event.type == stt.SpeechEventType.FINAL_TRANSCRIPT:
                 text = event.alternatives[0].text
                 logger.info(f"FINAL: {text}")
-                await room.local_participant.publish_data(text, reliable=True)
+                publisher.final(participant_identity, text)
 
-    asyncio.create_task(handle_stt())
+    stt_task = asyncio.create_task(handle_stt())
 
     try:
         logger.info("Audio Pipeline Started")
         async for event in clean_stream:
-            stt_stream.push_frame(event.frame)
+            stt_session.push_frame(event.frame)
             # await audio_source.capture_frame(event.frame)
                 
     except Exception as e:
         logger.error(f"Error in loop: {e}")
     finally:
-        await stt_stream.aclose()
+        stt_task.cancel()
+        await stt_session.aclose()
+        logger.info(f"STT pool: {stt_pool.stats()}")
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import numpy as np
+from aiohttp import web, WSMsgType
+
+logger = logging.getLogger("fake-stt")
+
+# Enough of Deepgram's live /v1/listen protocol for deepgram.STT(base_url=...)
+# to stream against it: linear16 audio in, SpeechStarted / Results /
+# UtteranceEnd out. Any audio louder than SPEECH_RMS is "speech" and is
+# transcribed as one "word" per WORD_SECONDS.
+SPEECH_RMS = 0.02
+WORD_SECONDS = 0.25
+INTERIM_SECONDS = 0.3
+END_OF_SPEECH_SILENCE = 0.5
+
+
+class FakeSTTServer:
+    """Local stand-in for a streaming STT service.
+
+    reject=True refuses every handshake (like bad credentials);
+    drop_after closes each session that many seconds after it opened
+    (like a provider idle timeout or outage).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, reject=False, drop_after=None):
+        self.host = host
+        self.port = port
+        self.reject = reject
+        self.drop_after = drop_after
+        self._runner = None
+
+        self.attempts = 0
+        self.sessions = 0
+        self.active = 0
+        self.dropped = 0
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/v1/listen"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/v1/listen", self._listen)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"Fake STT listening on {self.url}")
+        return self
+
+    async def aclose(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def stats(self):
+        return {
+            "attempts": self.attempts,
+            "sessions": self.sessions,
+            "active": self.active,
+            "dropped": self.dropped,
+        }
+
+    async def _listen(self, request):
+        self.attempts += 1
+        if self.reject:
+            return web.Response(status=401, text="rejected by fake server")
+
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sessions += 1
+        self.active += 1
+        sample_rate = int(request.query.get("sample_rate", "16000"))
+
+        drop_task = None
+        if self.drop_after is not None:
+            async def drop():
+                await asyncio.sleep(self.drop_after)
+                self.dropped += 1
+                await ws.close()
+            drop_task = asyncio.create_task(drop())
+
+        try:
+            await self._session(ws, sample_rate)
+        finally:
+            self.active -= 1
+            if drop_task is not None:
+                drop_task.cancel()
+        return ws
+
+    async def _session(self, ws, sample_rate):
+        audio_time = 0.0
+        speech_start = None
+        last_speech = None
+        last_interim = 0.0
+
+        async for msg in ws:
+            if msg.type == WSMsgType.TEXT:
+                if json.loads(msg.data).get("type") == "CloseStream":
+                    break
+                continue
+            if msg.type != WSMsgType.BINARY:
+                continue
+
+            samples = np.frombuffer(msg.data, dtype=np.int16)
+            if len(samples) == 0:
+                continue
+            duration = len(samples) / sample_rate
+            rms = float(np.sqrt(np.mean(samples.astype(np.float32) ** 2)) / 32768.0)
+            audio_time += duration
+
+            if rms > SPEECH_RMS:
+                if speech_start is None:
+                    speech_start = audio_time - duration
+                    last_interim = audio_time
+                    await ws.send_json({"type": "SpeechStarted", "channel": [0], "timestamp": speech_start})
+                last_speech = audio_time
+                if audio_time - last_interim >= INTERIM_SECONDS:
+                    last_interim = audio_time
+                    await ws.send_json(_results(speech_start, audio_time, is_final=False))
+            elif speech_start is not None and audio_time - last_speech >= END_OF_SPEECH_SILENCE:
+                await ws.send_json(_results(speech_start, last_speech, is_final=True))
+                await ws.send_json({"type": "UtteranceEnd", "channel": [0, 1], "last_word_end": last_speech})
+                speech_start = None
+
+        if not ws.closed:
+            await ws.send_json({"type": "Metadata", "request_id": "fake", "duration": audio_time})
+            await ws.close()
+
+
+def _results(start, end, is_final):
+    count = max(1, int((end - start) / WORD_SECONDS))
+    words = [
+        {
+            "word": f"word{i}",
+            "punctuated_word": f"word{i}",
+            "start": start + i * WORD_SECONDS,
+            "end": min(end, start + (i + 1) * WORD_SECONDS),
+            "confidence": 0.99,
+        }
+        for i in range(count)
+    ]
+    return {
+        "type": "Results",
+        "channel_index": [0, 1],
+        "start": start,
+        "duration": end - start,
+        "is_final": is_final,
+        "speech_final": is_final,
+        "from_finalize": False,
+        "channel": {
+            "alternatives": [{
+                "transcript": " ".join(w["word"] for w in words),
+                "confidence": 0.99,
+                "words": words,
+            }],
+        },
+        "metadata": {"request_id": "fake", "model_info": {"name": "fake"}},
+        "received_at": time.time(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake streaming STT server (Deepgram live protocol)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--reject", action="store_true", help="Refuse every session with 401")
+    parser.add_argument("--drop-after", type=float, default=None, help="Close sessions after this many seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def serve():
+        server = await FakeSTTServer(port=args.port, reject=args.reject, drop_after=args.drop_after).start()
+        print(f"Run an agent with DEEPGRAM_BASE_URL={server.url} DEEPGRAM_API_KEY=fake")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,134 @@
+import asyncio
+import collections
+import logging
+import time
+
+logger = logging.getLogger("frame-pipeline")
+
+# Queue policies
+DROP_OLDEST = "drop_oldest"   # Never block ingestion; a late frame is worthless (playback)
+NEVER_DROP = "never_drop"     # Every frame matters; ingestion waits for room (VAD/STT)
+
+_END = object()
+
+
+class FrameQueue:
+    """Bounded frame queue with an explicit overflow policy and lag metrics."""
+
+    def __init__(self, name, maxsize, policy):
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self._items = collections.deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+        self.put_count = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.got = 0
+
+    @property
+    def depth(self):
+        return len(self._items)
+
+    async def put(self, item):
+        if len(self._items) >= self.maxsize:
+            if self.policy == DROP_OLDEST:
+                self._items.popleft()
+                self.dropped += 1
+            else:
+                self._not_full.clear()
+                while len(self._items) >= self.maxsize:
+                    await self._not_full.wait()
+
+        self._items.append((time.monotonic(), item))
+        self.put_count += 1
+        self.max_depth = max(self.max_depth, len(self._items))
+        self._not_empty.set()
+
+    def close(self):
+        # The end marker bypasses the bound so shutdown never blocks
+        self._items.append((time.monotonic(), _END))
+        self._not_empty.set()
+
+    async def get(self):
+        while not self._items:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+        enqueued, item = self._items.popleft()
+        if len(self._items) < self.maxsize:
+            self._not_full.set()
+
+        if item is not _END:
+            lag = time.monotonic() - enqueued
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+            self.got += 1
+        return item
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "dropped": self.dropped,
+            "avg_lag_ms": round(self.total_lag / self.got * 1000, 1) if self.got else 0.0,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+        }
+
+
+class FramePipeline:
+    """Fans frames from one AudioStream out to independent consumers.
+
+    Every consumer gets its own FrameQueue and task, so a slow consumer
+    only delays itself (DROP_OLDEST) or, for NEVER_DROP queues, ingestion
+    once its queue is full, never another consumer directly.
+    """
+
+    def __init__(self, stream, name="pipeline", stats_interval=30.0):
+        self.stream = stream
+        self.name = name
+        self.stats_interval = stats_interval
+        self._consumers = []
+
+    def add_consumer(self, name, handler, maxsize, policy):
+        """`handler` is an async callable taking one rtc.AudioFrame."""
+        self._consumers.append((FrameQueue(name, maxsize, policy), handler))
+        return self
+
+    async def _consume(self, queue, handler):
+        while True:
+            frame = await queue.get()
+            if frame is _END:
+                return
+            try:
+                await handler(frame)
+            except Exception as e:
+                logger.error(f"[{self.name}] {queue.name} consumer error: {e}")
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            logger.info(f"[{self.name}] queues: {self.stats()}")
+
+    async def run(self):
+        tasks = [asyncio.create_task(self._consume(q, h)) for q, h in self._consumers]
+        reporter = asyncio.create_task(self._report())
+        try:
+            async for event in self.stream:
+                for queue, _ in self._consumers:
+                    await queue.put(event.frame)
+        finally:
+            for queue, _ in self._consumers:
+                queue.close()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            reporter.cancel()
+            logger.info(f"[{self.name}] final queue stats: {self.stats()}")
+
+    def stats(self):
+        return {queue.name: queue.stats() for queue, _ in self._consumers}
+
@@ -1,14 +1,18 @@
 import asyncio
 import logging
 import os
+import time
 import aiohttp
 import numpy as np
-import io
-import wave
 from livekit import rtc, api
-from livekit.plugins import noise_cancellation
-from groq import AsyncGroq  # <--- OFFICIAL GROQ CLIENT
 from dotenv import load_dotenv
+from transcript_publisher import TranscriptPublisher
+from model_registry import registry
+from frame_pipeline import FramePipeline, DROP_OLDEST, NEVER_DROP
+from recorder import MmapRecorder, recording_dir
+from speculation import SpeculativeTranscriber
+from segments import trim_utterance
+from groq_stt import groq_client, transcribe_with_groq
 
 load_dotenv()
 
@@ -20,6 +24,14 @@ ROOM_NAME = "my-room"
 # VAD Settings (Voice Activity Detection)
 MIN_VOLUME = 0.005           # Sensitivity (Lower = more sensitive)
 SILENCE_DURATION = 0.6       # Seconds of silence to wait before sending to Groq
+SPECULATIVE_PAUSE = 0.2      # Start transcribing after this much silence (None = off)
+
+# Frame queues between ingestion and each consumer (frames are 10 ms)
+ECHO_QUEUE_FRAMES = 5        # ~50 ms; older echo frames are dropped
+STT_QUEUE_FRAMES = 1000      # ~10 s; STT never drops, ingestion waits instead
+RECORD_QUEUE_FRAMES = 500   # The recorder only enqueues, so this never fills up
+
+RECORD_DIR = os.getenv("RECORD_DIR")   # Set to record each track (see recorder.py)
 
 async def main():
     agent_source = rtc.AudioSource(48000, 1)
@@ -28,12 +40,13 @@ async def main():
     # We use a shared session for LiveKit, but Groq manages its own connection
     async with aiohttp.ClientSession() as http_session:
         room = rtc.Room()
+        publisher = TranscriptPublisher(room).start()
 
         @room.on("track_subscribed")
         def on_track_subscribed(track, publication, participant):
             if track.kind == rtc.TrackKind.KIND_AUDIO and participant.identity != "python-agent":
                 logger.info(f"Detected audio from {participant.identity}")
-                asyncio.create_task(process_track(track, room, agent_source))
+                asyncio.create_task(process_track(track, participant.identity, publisher, agent_source))
 
         token = api.AccessToken(
             os.getenv("LIVEKIT_API_KEY"),
@@ -53,95 +66,121 @@ async def main():
         await room.local_participant.publish_track(agent_track)
         await asyncio.Event().wait()
 
-async def process_track(track, room, audio_source):
-    # 1. Initialize Groq Client
-    groq_client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"))
+async def process_track(track, participant_identity, publisher, audio_source):
+    # 1. Shared Groq Client
+    client = groq_client()
 
     # 2. Setup Noise Cancellation
     clean_stream = rtc.AudioStream(
         track,
-        noise_cancellation=noise_cancellation.BVC()
+        noise_cancellation=registry.bvc()
+    )
+    logger.info(f"Models: {registry.stats()}")
+
+    # Transcribes at a short pause and only publishes once the full silence
+    # window confirms end of turn
+    speculator = SpeculativeTranscriber(
+        lambda audio: transcribe_with_groq(client, audio, 48000)
     )
     
+    # Optional raw recording, with utterance boundaries on the same audio clock
+    recording = None
+    if RECORD_DIR:
+        recording = MmapRecorder(recording_dir(RECORD_DIR, participant_identity, track.sid))
+
     # Buffers for Audio Logic
     audio_buffer = [] 
-    last_speech_time = asyncio.get_event_loop().time()
+    speech_flags = []      # VAD decision for each buffered frame
+    # Audio clock (seconds of audio consumed), so a queue backlog doesn't
+    # distort the silence timing
+    audio_time = 0.0
+    last_speech_time = 0.0
+    utterance_start = 0.0
     is_speaking = False
 
-    logger.info("🌊 Groq Audio Pipeline Started")
+    # A. Play back clean audio (echo); stale frames are dropped, never queued up
+    async def play(frame):
+        await audio_source.capture_frame(frame)
 
-    try:
-        async for event in clean_stream:
-            # A. Play back clean audio (echo) immediately
-            await audio_source.capture_frame(event.frame)
-
-            # B. Process Audio for Groq
-            frame = event.frame
-            
-            # Convert LiveKit Frame to Int16 Numpy Array
-            data_int16 = np.frombuffer(frame.data, dtype=np.int16)
-            
-            # Calculate Volume (RMS)
-            volume = np.sqrt(np.mean(data_int16**2)) / 32768.0
-            current_time = asyncio.get_event_loop().time()
-
-            # --- LOGIC: DETECT SPEECH ---
-            if volume > MIN_VOLUME:
-                if not is_speaking:
-                    is_speaking = True
-                    print("   (User speaking...)", end="\r")
-                last_speech_time = current_time
+    # B. Process Audio for Groq
+    async def transcribe(frame):
+        nonlocal audio_buffer, speech_flags, audio_time, last_speech_time, utterance_start, is_speaking
+
+        # Convert LiveKit Frame to Int16 Numpy Array
+        data_int16 = np.frombuffer(frame.data, dtype=np.int16)
+        
+        # Calculate Volume (RMS)
+        volume = np.sqrt(np.mean(data_int16.astype(np.float32)**2)) / 32768.0
+        audio_time += frame.samples_per_channel / frame.sample_rate
+        current_time = audio_time
+
+        # --- LOGIC: DETECT SPEECH ---
+        if volume > MIN_VOLUME:
+            if not is_speaking:
+                is_speaking = True
+                utterance_start = current_time - frame.samples_per_channel / frame.sample_rate
+                print("   (User speaking...)", end="\r")
+            # Speech resumed: the speculative result is for a partial turn
+            speculator.discard()
+            last_speech_time = current_time
+            audio_buffer.append(data_int16)
+            speech_flags.append(True)
+        
+        # --- LOGIC: DETECT SILENCE & SEND ---
+        else:
+            if is_speaking:
+                # Keep recording during brief pauses
                 audio_buffer.append(data_int16)
-            
-            # --- LOGIC: DETECT SILENCE & SEND ---
-            else:
-                if is_speaking:
-                    # Keep recording during brief pauses
-                    audio_buffer.append(data_int16)
+                speech_flags.append(False)
+                silence = current_time - last_speech_time
+
+                # Short pause: start transcribing what we have so far
+                if SPECULATIVE_PAUSE is not None and silence > SPECULATIVE_PAUSE and not speculator.pending:
+                    speculator.speculate(trim_utterance(audio_buffer, speech_flags))
+                
+                # If silence is long enough, send to Groq
+                if silence > SILENCE_DURATION:
+                    is_speaking = False
                     
-                    # If silence is long enough, send to Groq
-                    if current_time - last_speech_time > SILENCE_DURATION:
-                        is_speaking = False
-                        
-                        if len(audio_buffer) > 0:
-                            # 1. Prepare WAV file in memory
-                            full_audio = np.concatenate(audio_buffer)
-                            audio_buffer = [] # Clear buffer
-                            
-                            wav_buffer = io.BytesIO()
-                            with wave.open(wav_buffer, 'wb') as wf:
-                                wf.setnchannels(1)
-                                wf.setsampwidth(2) # 16-bit
-                                wf.setframerate(frame.sample_rate) # 48000
-                                wf.writeframes(full_audio.tobytes())
-                            wav_buffer.name = "audio.wav"
-                            wav_buffer.seek(0)
-
-                            # 2. Send to Groq (Async)
-                            # We run this in background so audio doesn't stutter
-                            asyncio.create_task(transcribe_with_groq(groq_client, wav_buffer, room))
+                    if len(audio_buffer) > 0:
+                        # Only the speech span (plus margin) goes to inference
+                        full_audio = trim_utterance(audio_buffer, speech_flags)
+                        audio_buffer = [] # Clear buffer
+                        speech_flags = []
+                        if recording is not None:
+                            recording.mark_utterance(utterance_start, current_time)
+                        # Wall-clock start, from how much audio has passed since
+                        started_at = time.time() - (current_time - utterance_start)
+
+                        # commit() claims the speculation now; awaiting happens in the
+                        # background so audio doesn't stutter
+                        asyncio.create_task(publish_final(speculator.commit(full_audio), participant_identity, publisher, started_at))
+
+    pipeline = FramePipeline(clean_stream, name=participant_identity)
+    pipeline.add_consumer("echo", play, maxsize=ECHO_QUEUE_FRAMES, policy=DROP_OLDEST)
+    pipeline.add_consumer("stt", transcribe, maxsize=STT_QUEUE_FRAMES, policy=NEVER_DROP)
+
+    # C. Optional raw recording of the clean audio
+    if recording is not None:
+        pipeline.add_consumer("record", recording, maxsize=RECORD_QUEUE_FRAMES, policy=NEVER_DROP)
 
-    except Exception as e:
-        logger.error(f"Error in loop: {e}")
+    logger.info("🌊 Groq Audio Pipeline Started")
 
-async def transcribe_with_groq(client, audio_file, room):
     try:
-        # Call Groq API (Whisper Large V3)
-        transcription = await client.audio.transcriptions.create(
-            file=audio_file,
-            model="whisper-large-v3",
-            response_format="json",
-            language="en",
-            temperature=0.0
-        )
-        
-        text = transcription.text.strip()
-        if text:
-            logger.info(f"📝 FINAL: {text}")
-            await room.local_participant.publish_data(text, reliable=True)
-            
+        await pipeline.run()
     except Exception as e:
-        logger.error(f"Groq API Error: {e}")
+        logger.error(f"Error in loop: {e}")
+    finally:
+        speculator.discard()
+        if recording is not None:
+            await asyncio.to_thread(recording.close)
+        logger.info(f"Speculation: {speculator.stats()}")
+
+async def publish_final(transcription, participant_identity, publisher, started_at=None):
+    text = await transcription
+    if text:
+        logger.info(f"📝 FINAL: {text}")
+        publisher.final(participant_identity, text, started_at)
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,42 @@
+import io
+import logging
+import os
+import wave
+
+from model_registry import registry
+
+logger = logging.getLogger("groq-stt")
+
+
+def groq_client():
+    """The process-wide AsyncGroq client, shared by every track and agent."""
+    from groq import AsyncGroq  # <--- OFFICIAL GROQ CLIENT
+
+    return registry.stt("groq", lambda: AsyncGroq(api_key=os.getenv("GROQ_API_KEY")))
+
+
+async def transcribe_with_groq(client, audio_int16, sample_rate):
+    # 1. Prepare WAV file in memory
+    wav_buffer = io.BytesIO()
+    with wave.open(wav_buffer, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2) # 16-bit
+        wf.setframerate(sample_rate) # 48000
+        wf.writeframes(audio_int16.tobytes())
+    wav_buffer.name = "audio.wav"
+    wav_buffer.seek(0)
+
+    try:
+        # 2. Call Groq API (Whisper Large V3)
+        transcription = await client.audio.transcriptions.create(
+            file=wav_buffer,
+            model="whisper-large-v3",
+            response_format="json",
+            language="en",
+            temperature=0.0
+        )
+        return transcription.text.strip()
+            
+    except Exception as e:
+        logger.error(f"Groq API Error: {e}")
+        return ""
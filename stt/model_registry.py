@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import os
+import resource
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger("model-registry")
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        # ru_maxrss is the peak, in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ModelRegistry:
+    """Process-wide cache of models shared by every track.
+
+    Each model is loaded once on first use; tracks get cheap per-track
+    streams from the shared instance instead of loading their own copy.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+        self.load_counts = Counter()
+        self.load_seconds = {}
+        self.streams_opened = Counter()
+
+    def get(self, key, loader):
+        with self._lock:
+            if key not in self._models:
+                start = time.perf_counter()
+                self._models[key] = loader()
+                self.load_seconds[key] = time.perf_counter() - start
+                self.load_counts[key] += 1
+                logger.info(f"Loaded {key} in {self.load_seconds[key] * 1000:.0f}ms")
+            return self._models[key]
+
+    def silero_vad(self):
+        from livekit.plugins.silero import onnx_model
+
+        return self.get("silero-vad", lambda: BatchedSileroVAD(onnx_model.new_inference_session(force_cpu=True)))
+
+    def silero_vad_stream(self, track_id, **options):
+        # Streams share the loaded ONNX session and only hold per-track state
+        self.streams_opened["silero-vad"] += 1
+        return self.silero_vad().stream(track_id, **options)
+
+    def bvc(self):
+        from livekit.plugins import noise_cancellation
+
+        self.streams_opened["bvc"] += 1
+        return self.get("bvc", noise_cancellation.BVC)
+
+    def stt(self, name, factory):
+        self.streams_opened[f"stt:{name}"] += 1
+        return self.get(f"stt:{name}", factory)
+
+    def stats(self):
+        return {
+            "models": len(self._models),
+            "load_counts": dict(self.load_counts),
+            "streams_opened": dict(self.streams_opened),
+            "rss_mb": round(current_rss_mb(), 1),
+        }
+
+
+registry = ModelRegistry()
+
+
+# Silero v5 at 16 kHz: 32 ms windows, each prefixed with the tail of the last
+SILERO_SAMPLE_RATE = 16000
+SILERO_WINDOW = 512
+SILERO_CONTEXT = 64
+SILERO_STATE_SHAPE = (2, 1, 128)
+
+
+class BatchedSileroVAD:
+    """One Silero ONNX session scoring the windows of every active track together.
+
+    Each track's stream keeps its own RNN state and context; the session
+    runs once per batch on the stacked windows. Batches form on their own:
+    a window submitted while the previous batch is running waits for that
+    run to finish and goes out with every other window that arrived
+    meanwhile, so a lone track never waits for others. A track has at most
+    one window per batch, since its next window needs the state this one
+    produces.
+    """
+
+    def __init__(self, session):
+        self._session = session
+        # One inference at a time; the executor thread is the only user of the session
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="silero-vad")
+        self._sr = np.array(SILERO_SAMPLE_RATE, dtype=np.int64)
+        self._pending = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._tracks = set()
+
+        self.batches = 0
+        self.windows = 0
+        self.max_batch = 0
+
+    def stream(self, track_id, **options):
+        self._tracks.add(track_id)
+        return SileroVADStream(self, track_id, **options)
+
+    def unregister(self, stream):
+        self._tracks.discard(stream.track_id)
+        self._pending = [(s, w) for s, w in self._pending if s is not stream]
+
+    def submit(self, stream, window):
+        self._pending.append((stream, window))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending:
+                batch, rest, seen = [], [], set()
+                for stream, window in self._pending:
+                    (rest if stream in seen else batch).append((stream, window))
+                    seen.add(stream)
+                self._pending = rest
+                try:
+                    probabilities = await loop.run_in_executor(self._executor, self._infer, batch)
+                except Exception as e:
+                    logger.error(f"Silero VAD batch of {len(batch)} failed: {e}")
+                    continue
+                for (stream, _), probability in zip(batch, probabilities):
+                    stream._on_probability(probability)
+
+    def _infer(self, batch):
+        x = np.empty((len(batch), SILERO_CONTEXT + SILERO_WINDOW), dtype=np.float32)
+        state = np.empty((2, len(batch), 128), dtype=np.float32)
+        for i, (stream, window) in enumerate(batch):
+            x[i, :SILERO_CONTEXT] = stream._context
+            x[i, SILERO_CONTEXT:] = window
+            state[:, i] = stream._rnn_state[:, 0]
+
+        out, state = self._session.run(None, {"input": x, "state": state, "sr": self._sr})
+
+        for i, (stream, _) in enumerate(batch):
+            stream._context = x[i, -SILERO_CONTEXT:].copy()
+            stream._rnn_state = state[:, i:i + 1].copy()
+        self.batches += 1
+        self.windows += len(batch)
+        self.max_batch = max(self.max_batch, len(batch))
+        return out[:, 0].tolist()
+
+    def stats(self):
+        return {
+            "tracks": len(self._tracks),
+            "batches": self.batches,
+            "windows": self.windows,
+            "avg_batch": round(self.windows / self.batches, 2) if self.batches else None,
+            "max_batch": self.max_batch,
+        }
+
+
+class SileroVADStream:
+    """Per-track state for BatchedSileroVAD, used like the Silero plugin's VADStream.
+
+    push_frame() takes the track's frames; iterating the stream yields
+    livekit VADEvents: INFERENCE_DONE for every window, START_OF_SPEECH and
+    END_OF_SPEECH debounced the way the plugin does it. samples_index and
+    timestamp refer to the end of the window, in the track's own sample rate.
+    """
+
+    def __init__(self, vad, track_id, activation_threshold=0.5, min_speech_duration=0.05, min_silence_duration=0.55):
+        from livekit.agents import vad as agents_vad
+
+        self.vad = vad
+        self.track_id = track_id
+        self.activation_threshold = activation_threshold
+        self.deactivation_threshold = max(activation_threshold - 0.15, 0.01)
+        self.min_speech_duration = min_speech_duration
+        self.min_silence_duration = min_silence_duration
+        self._agents_vad = agents_vad
+
+        self._context = np.zeros(SILERO_CONTEXT, dtype=np.float32)
+        self._rnn_state = np.zeros(SILERO_STATE_SHAPE, dtype=np.float32)
+        self._resampler = None
+        self._input_rate = None
+        self._samples = np.empty(0, dtype=np.float32)
+        self._windows_done = 0
+        self._events = asyncio.Queue()
+        self._closed = False
+
+        self._speaking = False
+        self._speech_duration = 0.0
+        self._silence_duration = 0.0
+
+    def push_frame(self, frame):
+        if self._closed:
+            return
+        if self._input_rate is None:
+            self._input_rate = frame.sample_rate
+            if frame.sample_rate != SILERO_SAMPLE_RATE:
+                from livekit import rtc
+
+                self._resampler = rtc.AudioResampler(frame.sample_rate, SILERO_SAMPLE_RATE, num_channels=frame.num_channels)
+
+        for f in self._resampler.push(frame) if self._resampler else [frame]:
+            samples = np.frombuffer(f.data, dtype=np.int16).reshape(-1, f.num_channels)
+            self._samples = np.concatenate([self._samples, samples.mean(axis=1).astype(np.float32) / 32768.0])
+
+        while len(self._samples) >= SILERO_WINDOW:
+            window, self._samples = self._samples[:SILERO_WINDOW], self._samples[SILERO_WINDOW:]
+            self.vad.submit(self, window)
+
+    def _on_probability(self, probability):
+        if self._closed:
+            return
+        agents_vad = self._agents_vad
+        window_seconds = SILERO_WINDOW / SILERO_SAMPLE_RATE
+        self._windows_done += 1
+        timestamp = self._windows_done * window_seconds
+        samples_index = round(timestamp * self._input_rate)
+
+        if probability >= self.activation_threshold:
+            self._speech_duration += window_seconds
+            self._silence_duration = 0.0
+        elif probability < self.deactivation_threshold:
+            self._silence_duration += window_seconds
+            if not self._speaking:
+                self._speech_duration = 0.0
+
+        def event(type):
+            return agents_vad.VADEvent(
+                type=type,
+                samples_index=samples_index,
+                timestamp=timestamp,
+                speech_duration=self._speech_duration,
+                silence_duration=self._silence_duration,
+                probability=probability,
+                speaking=self._speaking,
+            )
+
+        self._events.put_nowait(event(agents_vad.VADEventType.INFERENCE_DONE))
+        if not self._speaking and self._speech_duration >= self.min_speech_duration:
+            self._speaking = True
+            self._events.put_nowait(event(agents_vad.VADEventType.START_OF_SPEECH))
+        elif self._speaking and self._silence_duration >= self.min_silence_duration:
+            self._speaking = False
+            self._events.put_nowait(event(agents_vad.VADEventType.END_OF_SPEECH))
+            self._speech_duration = 0.0
+
+    async def aclose(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.vad.unregister(self)
+        self._events.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        event = await self._events.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
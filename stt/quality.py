@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import os
+import time
+
+from whisper_engines import WHISPER_BEAM_SIZE
+
+logger = logging.getLogger("quality")
+
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+FALLBACK_MODEL = os.getenv("WHISPER_FALLBACK_MODEL", "tiny")
+
+# Ordered from best quality to cheapest. Each level may set:
+#   model            Whisper size to run locally
+#   noise_reduction  run noisereduce before Whisper (test_agent.py)
+#   beam_size        decoder beam; None = WHISPER_BEAM_SIZE, 1 = greedy
+#   backend          "local" or "groq" (offload the utterance to the cloud)
+QUALITY_LEVELS = [
+    {"name": "full", "backend": "local", "model": WHISPER_MODEL, "noise_reduction": True, "beam_size": None},
+    {"name": "no-nr", "backend": "local", "model": WHISPER_MODEL, "noise_reduction": False, "beam_size": None},
+    {"name": "greedy", "backend": "local", "model": WHISPER_MODEL, "noise_reduction": False, "beam_size": 1},
+    {"name": "small-model", "backend": "local", "model": FALLBACK_MODEL, "noise_reduction": False, "beam_size": 1},
+    {"name": "cloud", "backend": "groq", "model": None, "noise_reduction": False, "beam_size": None},
+]
+
+
+def effective_levels(levels=QUALITY_LEVELS, noise_reduction=True):
+    """Drops levels that would run exactly like the level above them.
+
+    With WHISPER_BEAM_SIZE=1, beam_size=None is already greedy, and agents
+    without noise reduction can't drop it, so some steps change nothing;
+    keeping them would only slow the controller's way down. The cloud
+    level is dropped when GROQ_API_KEY isn't set, since every offloaded
+    utterance would fail.
+    """
+    if not os.getenv("GROQ_API_KEY"):
+        levels = [level for level in levels if level["backend"] != "groq"]
+
+    def settings(level):
+        if level["backend"] != "local":
+            return (level["backend"],)
+        return (
+            level["backend"],
+            level["model"],
+            noise_reduction and level["noise_reduction"],
+            level["beam_size"] or WHISPER_BEAM_SIZE,
+        )
+
+    kept = []
+    for level in levels:
+        if not kept or settings(level) != settings(kept[-1]):
+            kept.append(level)
+    return kept
+
+
+def local_model_sizes(levels=QUALITY_LEVELS):
+    """Whisper sizes the levels can switch to, so they can all be preloaded."""
+    sizes = []
+    for level in levels:
+        if level["backend"] == "local" and level["model"] not in sizes:
+            sizes.append(level["model"])
+    return sizes
+
+
+class QualityController:
+    """Steps quality down under load and back up once load recovers.
+
+    Load signals, checked every `interval` seconds:
+      - event loop lag: how late a periodic sleep wakes up
+      - executor backlog: transcriptions submitted but not finished
+      - RTF: processing time / audio duration of recent local utterances,
+        forgotten after `rtf_ttl` seconds without one
+    `down_after` consecutive overloaded checks step one level down;
+    `up_after` consecutive calm checks step one level up. Every transition
+    is logged with the signals that caused it.
+    """
+
+    def __init__(self, levels=QUALITY_LEVELS, interval=1.0,
+                 lag_high=0.15, lag_low=0.03,
+                 backlog_high=2, backlog_low=0,
+                 rtf_high=0.8, rtf_low=0.4,
+                 down_after=2, up_after=10, rtf_ttl=10.0):
+        self.levels = levels
+        self.interval = interval
+        self.lag_high, self.lag_low = lag_high, lag_low
+        self.backlog_high, self.backlog_low = backlog_high, backlog_low
+        self.rtf_high, self.rtf_low = rtf_high, rtf_low
+        self.down_after, self.up_after = down_after, up_after
+        self.rtf_ttl = rtf_ttl
+
+        self.index = 0
+        self.loop_lag = 0.0
+        self.backlog = 0
+        self.rtf = 0.0
+        self._rtf_at = None
+        self._overloaded_checks = 0
+        self._calm_checks = 0
+        self._task = None
+        self.transitions = []
+
+    @property
+    def level(self):
+        return self.levels[self.index]
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._monitor())
+        return self
+
+    async def run_in_executor(self, fn):
+        """Runs a blocking transcription in the default executor, counting the backlog."""
+        self.backlog += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, fn)
+        finally:
+            self.backlog -= 1
+
+    def report(self, processing_seconds, audio_seconds, level):
+        """Records the RTF of one utterance transcribed at `level`."""
+        # Cloud latency says nothing about local load, and an RTF measured at
+        # another level would be stale after a transition
+        if audio_seconds <= 0 or level["backend"] != "local" or level is not self.level:
+            return
+        # Smoothed so one odd utterance doesn't flip the level
+        rtf = processing_seconds / audio_seconds
+        self.rtf = rtf if self.rtf == 0.0 else 0.7 * self.rtf + 0.3 * rtf
+        self._rtf_at = time.perf_counter()
+
+    async def _monitor(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.loop_lag = max(0.0, time.perf_counter() - expected)
+            if self._rtf_at is not None and time.perf_counter() - self._rtf_at > self.rtf_ttl:
+                # No recent local utterance to back it up
+                self.rtf = 0.0
+                self._rtf_at = None
+            self._evaluate()
+
+    def _signals(self):
+        return f"loop_lag={self.loop_lag * 1000:.0f}ms backlog={self.backlog} rtf={self.rtf:.2f}"
+
+    def _evaluate(self):
+        overloaded = (
+            self.loop_lag > self.lag_high
+            or self.backlog > self.backlog_high
+            or self.rtf > self.rtf_high
+        )
+        calm = (
+            self.loop_lag < self.lag_low
+            and self.backlog <= self.backlog_low
+            and self.rtf < self.rtf_low
+        )
+
+        if overloaded:
+            self._overloaded_checks += 1
+            self._calm_checks = 0
+            if self._overloaded_checks >= self.down_after and self.index < len(self.levels) - 1:
+                self._step(+1)
+        elif calm:
+            self._calm_checks += 1
+            self._overloaded_checks = 0
+            if self._calm_checks >= self.up_after and self.index > 0:
+                self._step(-1)
+        else:
+            self._overloaded_checks = 0
+            self._calm_checks = 0
+
+    def _step(self, direction):
+        previous = self.level["name"]
+        self.index += direction
+        self._overloaded_checks = 0
+        self._calm_checks = 0
+        # The old RTF was measured at the previous level
+        self.rtf = 0.0
+        self._rtf_at = None
+        self.transitions.append((time.time(), previous, self.level["name"]))
+        logger.warning(
+            f"Quality {'down' if direction > 0 else 'up'}: {previous} -> {self.level['name']} ({self._signals()})"
+        )
@@ -0,0 +1,197 @@
+import json
+import logging
+import mmap
+import os
+import queue
+import re
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger("recorder")
+
+SAMPLE_RATE = 48000
+SEGMENT_SECONDS = 60
+
+# One record per frame: audio time since recording start, where it lives
+INDEX_DTYPE = np.dtype([("t", "<f8"), ("segment", "<u4"), ("offset", "<u4"), ("samples", "<u4")])
+UTTERANCE_DTYPE = np.dtype([("start", "<f8"), ("end", "<f8")])
+
+
+def recording_dir(root, participant_identity, track_sid):
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", participant_identity)
+    return os.path.join(root, f"{safe}-{track_sid}")
+
+
+class MmapRecorder:
+    """Appends raw int16 frames for one track to memory-mapped segment files.
+
+    Layout of a recording directory:
+        meta.json         sample rate, segment size, wall-clock start
+        seg-00000.pcm     preallocated SEGMENT_SECONDS of int16 samples, ...
+        index.bin         INDEX_DTYPE record per frame
+        utterances.bin    UTTERANCE_DTYPE record per marked utterance
+
+    Frames are copied into the map by a writer thread; the event loop only
+    enqueues them, so it can be used directly as a FramePipeline consumer.
+    Timestamps are audio time (samples recorded / sample rate).
+    """
+
+    def __init__(self, path, sample_rate=SAMPLE_RATE, segment_seconds=SEGMENT_SECONDS):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.segment_bytes = segment_seconds * sample_rate * 2
+        os.makedirs(path, exist_ok=True)
+
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({
+                "sample_rate": sample_rate,
+                "segment_bytes": self.segment_bytes,
+                "started_at": time.time(),
+            }, f)
+
+        self._index = open(os.path.join(path, "index.bin"), "wb")
+        self._utterances = open(os.path.join(path, "utterances.bin"), "wb")
+        self._segment = -1
+        self._map = None
+        self._offset = 0
+        self._samples = 0
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def duration(self):
+        return self._samples / self.sample_rate
+
+    async def __call__(self, frame):
+        self.append(bytes(frame.data))
+
+    def append(self, pcm):
+        # Timestamp on the caller's side so the audio clock never depends on
+        # how far behind the writer thread is
+        self._queue.put(("frame", self.duration, pcm))
+        self._samples += len(pcm) // 2
+
+    def mark_utterance(self, start, end):
+        self._queue.put(("utterance", start, end))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _open_segment(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+        self._segment += 1
+        seg_path = os.path.join(self.path, f"seg-{self._segment:05d}.pcm")
+        with open(seg_path, "w+b") as f:
+            f.truncate(self.segment_bytes)
+            self._map = mmap.mmap(f.fileno(), self.segment_bytes)
+        self._offset = 0
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                if item[0] == "frame":
+                    self._write_frame(item[1], item[2])
+                else:
+                    record = np.array([(item[1], item[2])], dtype=UTTERANCE_DTYPE)
+                    self._utterances.write(record.tobytes())
+                    self._utterances.flush()
+            except Exception as e:
+                logger.error(f"Recorder write failed: {e}")
+
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+        self._index.close()
+        self._utterances.close()
+
+    def _write_frame(self, t, pcm):
+        # Frames never straddle segments, so any frame run is contiguous
+        if self._map is None or self._offset + len(pcm) > self.segment_bytes:
+            self._open_segment()
+        self._map[self._offset:self._offset + len(pcm)] = pcm
+        record = np.array([(t, self._segment, self._offset, len(pcm) // 2)], dtype=INDEX_DTYPE)
+        self._index.write(record.tobytes())
+        self._offset += len(pcm)
+        if self._queue.empty():
+            self._index.flush()
+
+
+class RecordingReader:
+    """Random access to a recording written by MmapRecorder.
+
+    slice() returns a read-only int16 view straight into the segment map
+    when the range lies in one segment (the common case), and only copies
+    when it crosses a segment boundary.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.sample_rate = self.meta["sample_rate"]
+        self.index = np.fromfile(os.path.join(path, "index.bin"), dtype=INDEX_DTYPE)
+        utterances_path = os.path.join(path, "utterances.bin")
+        self.utterances = (
+            np.fromfile(utterances_path, dtype=UTTERANCE_DTYPE)
+            if os.path.exists(utterances_path) else np.zeros(0, dtype=UTTERANCE_DTYPE)
+        )
+        self._maps = {}
+
+    @property
+    def duration(self):
+        if len(self.index) == 0:
+            return 0.0
+        last = self.index[-1]
+        return float(last["t"]) + int(last["samples"]) / self.sample_rate
+
+    def _segment_map(self, segment):
+        if segment not in self._maps:
+            with open(os.path.join(self.path, f"seg-{segment:05d}.pcm"), "rb") as f:
+                self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._maps[segment]
+
+    def slice(self, start, end):
+        """int16 samples for the frames starting in [start, end) seconds."""
+        times = self.index["t"]
+        first = np.searchsorted(times, start, side="right") - 1
+        first = max(first, 0)
+        last = np.searchsorted(times, end, side="left")
+        frames = self.index[first:last]
+        if len(frames) == 0:
+            return np.zeros(0, dtype=np.int16)
+
+        views = []
+        run_start = 0
+        for i in range(1, len(frames) + 1):
+            # A run ends where the segment changes or offsets stop being contiguous
+            if i == len(frames) or (
+                frames[i]["segment"] != frames[i - 1]["segment"]
+                or frames[i]["offset"] != frames[i - 1]["offset"] + 2 * frames[i - 1]["samples"]
+            ):
+                run = frames[run_start:i]
+                mm = self._segment_map(int(run[0]["segment"]))
+                views.append(np.frombuffer(
+                    mm, dtype=np.int16, count=int(run["samples"].sum()), offset=int(run[0]["offset"])
+                ))
+                run_start = i
+
+        return views[0] if len(views) == 1 else np.concatenate(views)
+
+    def utterance(self, i):
+        u = self.utterances[i]
+        return self.slice(float(u["start"]), float(u["end"]))
+
+    def close(self):
+        for mm in self._maps.values():
+            mm.close()
+        self._maps.clear()
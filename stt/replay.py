@@ -0,0 +1,44 @@
+import argparse
+import time
+
+from recorder import RecordingReader
+from startup import WHISPER_CACHE_DIR
+from whisper_engines import ENGINES, create_engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-transcribe the utterances of a recorded track offline.")
+    parser.add_argument("recording", help="Recording directory written by MmapRecorder")
+    parser.add_argument("--engine", action="append", choices=sorted(ENGINES),
+                        help="Whisper engine to compare (repeatable, default: both)")
+    parser.add_argument("--size", default="base", help="Whisper model size")
+    parser.add_argument("--start", type=float, help="Transcribe this range instead of the marked utterances")
+    parser.add_argument("--end", type=float)
+    args = parser.parse_args()
+
+    reader = RecordingReader(args.recording)
+    if args.start is not None:
+        ranges = [(args.start, args.end if args.end is not None else reader.duration)]
+    else:
+        ranges = [(float(u["start"]), float(u["end"])) for u in reader.utterances]
+    print(f"{args.recording}: {reader.duration:.1f}s recorded, {len(ranges)} range(s)")
+
+    for engine_name in args.engine or sorted(ENGINES):
+        model = create_engine(engine_name, args.size, download_root=WHISPER_CACHE_DIR)
+        print(f"\n{engine_name} ({args.size})")
+        for start, end in ranges:
+            # Zero-copy view into the recording; only the float conversion copies
+            samples = reader.slice(start, end)
+            audio = (samples.astype("float32") / 32768.0)[::3]   # 48k -> 16k
+            t0 = time.perf_counter()
+            result = model.transcribe(audio)
+            latency = (time.perf_counter() - t0) * 1000
+            rtf = latency / 1000 / max(end - start, 1e-6)
+            print(f"  [{start:7.2f}-{end:7.2f}] {latency:7.1f}ms RTF {rtf:.2f} | {result['text'].strip()}")
+            del samples
+
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()
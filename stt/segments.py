@@ -0,0 +1,32 @@
+import numpy as np
+
+# Audio kept on each side of the detected speech span
+TRIM_MARGIN = 0.15
+
+
+def trim_utterance(frames, speech_flags, sample_rate=48000, margin=TRIM_MARGIN):
+    """Concatenates buffered frames, keeping only the speech span plus `margin`.
+
+    `frames` are int16 arrays and `speech_flags` the VAD's per-frame
+    decisions for them. The silence before the first and after the last
+    speech frame is dropped, except for `margin` seconds either side. If no
+    frame was marked as speech the buffer is returned untrimmed.
+    """
+    speech = [i for i, is_speech in enumerate(speech_flags) if is_speech]
+    if not speech:
+        return np.concatenate(frames)
+
+    first, last = speech[0], speech[-1]
+    margin_samples = int(margin * sample_rate)
+
+    # Walk outwards frame by frame until the margin is covered
+    start, covered = first, 0
+    while start > 0 and covered < margin_samples:
+        start -= 1
+        covered += len(frames[start])
+    end, covered = last + 1, 0
+    while end < len(frames) and covered < margin_samples:
+        covered += len(frames[end])
+        end += 1
+
+    return np.concatenate(frames[start:end])
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("speculation")
+
+
+class SpeculativeTranscriber:
+    """Starts transcription at a short pause and commits it at end of turn.
+
+    `transcribe` is an async callable taking the utterance audio and
+    returning text. The agent calls:
+        speculate(audio)  once the pause passes the short threshold,
+        discard()         if speech resumes before the silence window ends,
+        commit(audio)     when the full silence window confirms end of turn.
+    commit() reuses the speculative result when one is in flight (a hit) and
+    otherwise transcribes `audio` from scratch. It claims the speculation
+    synchronously and returns an awaitable, so a later speculate() can't be
+    picked up by an earlier turn's commit however late it is awaited.
+
+    Pass cancellable=False when `transcribe` runs in an executor: the thread
+    can't be interrupted, so a discarded speculation is left to finish and
+    its whole runtime is counted as wasted.
+    """
+
+    def __init__(self, transcribe, cancellable=True):
+        self.transcribe = transcribe
+        self.cancellable = cancellable
+        self._task = None
+        self._started = None
+
+        self.speculations = 0
+        self.hits = 0
+        self.discarded = 0
+        self.unspeculated = 0
+        self.wasted_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    @property
+    def pending(self):
+        return self._task is not None
+
+    def speculate(self, audio):
+        if self._task is not None:
+            return
+        self.speculations += 1
+        self._started = time.perf_counter()
+        self._task = asyncio.create_task(self._timed(audio))
+
+    async def _timed(self, audio):
+        text = await self.transcribe(audio)
+        return text, time.perf_counter()
+
+    def discard(self):
+        if self._task is None:
+            return
+        task, started = self._task, self._started
+        self._task = None
+        self.discarded += 1
+
+        def count_waste(t):
+            self.wasted_seconds += time.perf_counter() - started
+            if not t.cancelled() and t.exception() is not None:
+                logger.debug(f"Discarded speculation failed: {t.exception()}")
+
+        task.add_done_callback(count_waste)
+        if self.cancellable:
+            task.cancel()
+
+    def commit(self, audio):
+        if self._task is None:
+            self.unspeculated += 1
+            return self.transcribe(audio)
+
+        task, started = self._task, self._started
+        self._task = None
+        self.hits += 1
+        # Everything computed before now overlapped the silence window
+        return self._finish(task, started, time.perf_counter())
+
+    async def _finish(self, task, started, committed_at):
+        text, finished_at = await task
+        self.saved_seconds += min(committed_at, finished_at) - started
+        return text
+
+    def stats(self):
+        attempts = self.hits + self.discarded
+        return {
+            "speculations": self.speculations,
+            "hits": self.hits,
+            "discarded": self.discarded,
+            "unspeculated": self.unspeculated,
+            "hit_rate": round(self.hits / attempts, 2) if attempts else 0.0,
+            "wasted_s": round(self.wasted_seconds, 2),
+            "saved_s": round(self.saved_seconds, 2),
+        }
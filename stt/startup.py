@@ -0,0 +1,62 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from whisper_engines import WHISPER_ENGINE, create_engine
+
+logger = logging.getLogger("startup")
+
+# Weights are read from here; point it at a baked-in or mounted cache so
+# replicas never download at boot.
+WHISPER_CACHE_DIR = os.getenv("WHISPER_CACHE_DIR", os.path.expanduser("~/.cache/whisper"))
+
+# Touched once the agent is warm, for exec/file based readiness probes
+READY_FILE = os.getenv("READY_FILE")
+
+
+class Startup:
+    """Times each startup phase and announces readiness with a breakdown."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.phases = []
+        self.is_ready = False
+
+    @contextmanager
+    def phase(self, label):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((label, time.perf_counter() - start))
+
+    def ready(self):
+        total = time.perf_counter() - self.started
+        breakdown = ", ".join(f"{label}={seconds * 1000:.0f}ms" for label, seconds in self.phases)
+        logger.info(f"{self.name} READY in {total * 1000:.0f}ms ({breakdown})")
+
+        if READY_FILE:
+            with open(READY_FILE, "w") as f:
+                f.write(f"{total:.3f}\n")
+        self.is_ready = True
+
+
+def load_whisper(size="base", startup=None, engine=None):
+    """Imports the selected Whisper engine and loads `size` from WHISPER_CACHE_DIR."""
+    startup = startup or Startup("whisper")
+    engine = engine or WHISPER_ENGINE
+    with startup.phase(f"load {engine} {size}"):
+        model = create_engine(engine, size, download_root=WHISPER_CACHE_DIR)
+    return model
+
+
+def warm_up_whisper(model, startup=None, seconds=1.0):
+    """Runs one transcription of synthetic low-level noise so kernels are warm."""
+    import numpy as np
+
+    startup = startup or Startup("whisper")
+    audio = (np.random.default_rng(0).standard_normal(int(16000 * seconds)) * 0.01).astype(np.float32)
+    with startup.phase("warm-up whisper"):
+        model.transcribe(audio)
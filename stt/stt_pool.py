@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import statistics
+import time
+
+from livekit import rtc
+
+logger = logging.getLogger("stt-pool")
+
+RECONNECT_BASE_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+
+
+def backoff_delay(failures):
+    """0 for the first failure, then exponential up to RECONNECT_MAX_DELAY."""
+    if failures <= 1:
+        return 0.0
+    return min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2 ** (failures - 2))
+
+
+class PooledStream:
+    """A pooled STT stream plus the one task that ever reads its events.
+
+    Iterating a provider stream goes through a tee'd async generator, and
+    cancelling a reader in the middle of it breaks the stream for any later
+    reader. So the reader is never handed over: it runs for the stream's
+    whole life, drops what arrives while the stream is idle (only keepalive
+    silence has been pushed) and queues everything after the claim.
+    `alive` goes False once the provider ends the session.
+
+    Claimed streams are used like the provider's: push_frame(), iterate the
+    events, aclose().
+    """
+
+    def __init__(self, stream, claimed=False):
+        self.stream = stream
+        self.opened_at = time.perf_counter()
+        self.alive = True
+        self.claimed = claimed
+        self.warm = False
+        self.keepalive_seconds = 0.0
+        self._events = asyncio.Queue()
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        try:
+            async for event in self.stream:
+                if self.claimed:
+                    self._events.put_nowait(event)
+        except Exception as e:
+            if self.claimed:
+                logger.error(f"STT stream error: {e}")
+            else:
+                logger.debug(f"Idle STT stream failed: {e}")
+        finally:
+            self.alive = False
+            self._events.put_nowait(None)
+
+    def push_frame(self, frame):
+        self.stream.push_frame(frame)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        event = await self._events.get()
+        if event is None:
+            # Leave the marker for anyone else still waiting
+            self._events.put_nowait(None)
+            raise StopAsyncIteration
+        return event
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        except Exception as e:
+            logger.debug(f"Closing STT stream failed: {e}")
+        self._reader.cancel()
+
+
+class WarmStreamPool:
+    """Keeps streaming STT sessions open before any track needs them.
+
+    `stt_provider.stream()` is called ahead of time so the connection
+    handshake is done by the time a track is subscribed; claim() hands one
+    over immediately and a replacement is opened in the background. Idle
+    sessions get a frame of silence every `keepalive_interval` seconds so
+    the provider doesn't time them out, and dead ones are replaced. If idle
+    sessions keep dying before they reach one keepalive interval, refills
+    back off the same way reconnects do.
+
+    Only stream(), push_frame(), aclose() and iterating a stream's events
+    are used, so any provider works, including deepgram.STT pointed at
+    fake_stt_server.py (see test_stt_pool.py). Agents normally use an
+    STTSession rather than claiming streams themselves.
+    """
+
+    def __init__(self, stt_provider, size=2, keepalive_interval=5.0, sample_rate=48000):
+        self.stt_provider = stt_provider
+        self.size = size
+        self.keepalive_interval = keepalive_interval
+        self.sample_rate = sample_rate
+        self._idle = []
+        self._task = None
+        self._idle_failures = 0
+        self._refill_after = 0.0
+
+        self.opened = 0
+        self.claimed_warm = 0
+        self.claimed_cold = 0
+        self.replaced = 0
+        self.reconnects = 0
+        self.first_transcript = {"warm": [], "cold": []}
+
+    def start(self):
+        self._refill()
+        if self._task is None:
+            self._task = asyncio.create_task(self._keepalive())
+        return self
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        idle, self._idle = self._idle, []
+        for entry in idle:
+            await self._discard(entry)
+
+    def _refill(self):
+        if time.perf_counter() < self._refill_after:
+            return
+        while len(self._idle) < self.size:
+            self.opened += 1
+            self._idle.append(PooledStream(self.stt_provider.stream()))
+
+    async def _discard(self, entry):
+        await entry.aclose()
+
+    async def claim(self):
+        """Returns a PooledStream; its `warm` is False if the pool was empty.
+
+        Its keepalive_seconds is the silence the provider already heard on
+        this stream, so its timestamps are that much ahead of the track's audio.
+        """
+        while self._idle:
+            entry = self._idle.pop(0)
+            if entry.alive:
+                entry.claimed = entry.warm = True
+                self.claimed_warm += 1
+                self._refill()
+                logger.info(f"Claimed warm STT stream (opened {time.perf_counter() - entry.opened_at:.1f}s ago)")
+                return entry
+            self.replaced += 1
+            await self._discard(entry)
+
+        self.claimed_cold += 1
+        self.opened += 1
+        entry = PooledStream(self.stt_provider.stream(), claimed=True)
+        self._refill()
+        return entry
+
+    async def reconnect(self, dropped, failures=0):
+        """Closes a claimed stream that ended mid-session and claims its replacement.
+
+        `failures` counts consecutive streams that ended without a single
+        event, this one included; see backoff_delay(). A provider that
+        rejects every session isn't hammered with new connections.
+        """
+        self.reconnects += 1
+        await dropped.aclose()
+        delay = backoff_delay(failures)
+        if delay:
+            logger.warning(f"STT stream failed {failures} time(s) in a row; retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        return await self.claim()
+
+    async def _keepalive(self):
+        samples = self.sample_rate // 100
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            now = time.perf_counter()
+            # Snapshot: claim() may take entries while a discard is awaited
+            for entry in list(self._idle):
+                if entry not in self._idle:
+                    continue
+                if entry.alive:
+                    try:
+                        entry.push_frame(rtc.AudioFrame.create(self.sample_rate, 1, samples))
+                        entry.keepalive_seconds += samples / self.sample_rate
+                        if now - entry.opened_at >= self.keepalive_interval:
+                            self._idle_failures = 0
+                        continue
+                    except Exception as e:
+                        logger.warning(f"Idle STT stream failed keepalive ({e}); replacing it")
+                else:
+                    logger.warning("Idle STT stream dropped; replacing it")
+                self._idle.remove(entry)
+                self.replaced += 1
+                self._idle_failures += 1
+                self._refill_after = now + backoff_delay(self._idle_failures)
+                await self._discard(entry)
+            self._refill()
+
+    def report_first_transcript(self, seconds, warm):
+        """Time from track subscription to the first interim transcript."""
+        samples = self.first_transcript["warm" if warm else "cold"]
+        samples.append(seconds)
+        logger.info(
+            f"First transcript {seconds * 1000:.0f}ms after subscription "
+            f"({'warm' if warm else 'cold'} stream; median {statistics.median(samples) * 1000:.0f}ms over {len(samples)})"
+        )
+
+    def stats(self):
+        return {
+            "idle": len(self._idle),
+            "opened": self.opened,
+            "claimed_warm": self.claimed_warm,
+            "claimed_cold": self.claimed_cold,
+            "replaced": self.replaced,
+            "reconnects": self.reconnects,
+            "first_transcript_ms": {
+                kind: round(statistics.median(v) * 1000) if v else None
+                for kind, v in self.first_transcript.items()
+            },
+        }
+
+
+class STTSession:
+    """One track's transcription across dropped STT streams.
+
+    push_frame() goes to the current stream and is dropped while a
+    replacement is being claimed. Iterating yields the events of each
+    stream in turn; when one ends, the next is claimed through
+    pool.reconnect(), backing off while streams keep ending without a
+    single event. on_connect(stream) is called each time a stream is put
+    in place, the first one included.
+    """
+
+    def __init__(self, pool, on_connect=None):
+        self.pool = pool
+        self.on_connect = on_connect
+        self.stream = None
+        self.warm = False
+        self.failures = 0   # Consecutive streams that ended without an event
+
+    async def start(self):
+        self._connected(await self.pool.claim())
+        self.warm = self.stream.warm
+        return self
+
+    def _connected(self, stream):
+        self.stream = stream
+        if self.on_connect is not None:
+            self.on_connect(stream)
+
+    def push_frame(self, frame):
+        if self.stream is not None:
+            self.stream.push_frame(frame)
+
+    async def __aiter__(self):
+        while True:
+            got_event = False
+            async for event in self.stream:
+                got_event = True
+                yield event
+
+            # The track is still live (else the caller stopped iterating): carry
+            # on with a fresh session; frames are dropped until it is in place
+            self.failures = 0 if got_event else self.failures + 1
+            logger.warning("STT stream dropped; reconnecting")
+            dropped, self.stream = self.stream, None
+            self._connected(await self.pool.reconnect(dropped, self.failures))
+
+    async def aclose(self):
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            await stream.aclose()
@@ -1,14 +1,18 @@
 import asyncio
+import bisect
 import logging
 import os
+import time
 import numpy as np
-import whisper
-import noisereduce as nr
 import aiohttp
-from scipy import signal
 from livekit import rtc, api
-from livekit.plugins import silero
+from livekit.agents.vad import VADEventType
 from dotenv import load_dotenv
+from transcript_publisher import TranscriptPublisher
+from startup import Startup, load_whisper, warm_up_whisper
+from model_registry import registry, SILERO_SAMPLE_RATE, SILERO_WINDOW
+from segments import trim_utterance
+from quality import QualityController, effective_levels, local_model_sizes
 
 load_dotenv()
 
@@ -17,23 +21,61 @@ logger = logging.getLogger("pro-local-agent")
 
 ROOM_NAME = "my-room"
 
-# 1. Load Whisper Model
-print("Loading Whisper model...")
-model = whisper.load_model("base")
-print("✅ Model loaded.")
+# Silero VAD with slightly faster settings
+VAD_OPTIONS = dict(
+    activation_threshold=0.5, # Per-window speech probability (Silero's default)
+    min_silence_duration=0.5, # Stop quickly after speech ends
+    min_speech_duration=0.1   # Trigger quickly on short words
+)
+
+# Heavy backends are imported and warmed up in main(), not at import time
+nr = None
+signal = None
+
+# Picks model size / noise reduction / beam / cloud offload from current load
+quality = None
+
+def whisper_model(size, startup=None):
+    return registry.get(f"whisper:{size}", lambda: load_whisper(size, startup))
+
+def load_backends(startup):
+    global nr, signal
+    # Every size a quality level can switch to, so a step down never pays a cold load
+    for size in local_model_sizes():
+        whisper_model(size, startup)
+
+    with startup.phase("import scipy+noisereduce"):
+        import noisereduce
+        from scipy import signal as scipy_signal
+        nr, signal = noisereduce, scipy_signal
+
+    with startup.phase("load silero vad"):
+        registry.silero_vad()
+
+    for size in local_model_sizes():
+        warm_up_whisper(whisper_model(size), startup)
+    with startup.phase("warm-up noisereduce"):
+        warm_up = np.random.default_rng(0).standard_normal(16000).astype(np.float32) * 0.01
+        nr.reduce_noise(y=warm_up, sr=16000, stationary=True, prop_decrease=0.75)
 
 async def main():
+    global quality
+    startup = Startup("pro-local-agent")
+    load_backends(startup)
+    quality = QualityController(levels=effective_levels()).start()
+
     agent_source = rtc.AudioSource(48000, 1)
     agent_track = rtc.LocalAudioTrack.create_audio_track("agent_output", agent_source)
 
     async with aiohttp.ClientSession() as http_session:
         room = rtc.Room()
+        publisher = TranscriptPublisher(room).start()
 
         @room.on("track_subscribed")
         def on_track_subscribed(track, publication, participant):
             if track.kind == rtc.TrackKind.KIND_AUDIO and participant.identity != "python-agent":
                 logger.info(f"Detected audio from {participant.identity}")
-                asyncio.create_task(process_track(track, room, agent_source))
+                asyncio.create_task(process_track(track, participant.identity, publisher, agent_source))
 
         token = api.AccessToken(
             os.getenv("LIVEKIT_API_KEY"),
@@ -46,6 +88,7 @@ async def main():
         try:
             await room.connect(os.getenv("LIVEKIT_URL"), token)
             logger.info("✅ Connected. Speak into your mic!")
+            startup.ready()
         except Exception as e:
             logger.error(f"Failed to connect: {e}")
             return
@@ -53,77 +96,126 @@ async def main():
         await room.local_participant.publish_track(agent_track)
         await asyncio.Event().wait()
 
-async def process_track(track, room, audio_source):
-    # Initialize Silero VAD with slightly faster settings
-    vad = silero.VAD.load(
-        min_silence_duration=0.5, # Stop quickly after speech ends
-        min_speech_duration=0.1   # Trigger quickly on short words
-    )
-    vad_stream = vad.stream()
+async def process_track(track, participant_identity, publisher, audio_source):
+    # The VAD session is loaded once per process and scores every track's
+    # windows in one batch; this is just per-track state
+    vad_stream = registry.silero_vad_stream(track.sid, **VAD_OPTIONS)
+    logger.info(f"Models: {registry.stats()}, VAD: {registry.silero_vad().stats()}")
     
     audio_stream = rtc.AudioStream(track)
     audio_buffer = [] 
+    speech_flags = []      # Whether any Silero window covering each frame was speech
+    frame_starts = []      # Track sample index where each buffered frame starts
+    samples_pushed = 0
+    utterance_started_at = None   # Wall clock, for the published caption
     main_loop = asyncio.get_event_loop()
     MAX_BUFFER_FRAMES = 500 
 
-    logger.info("Pipeline Started (Debug Mode)")
-
-    async for event in audio_stream:
-        # --- DEBUG: Print Audio Volume ---
-        # This proves if Python is actually hearing you
-        data_int16 = np.frombuffer(event.frame.data, dtype=np.int16)
-        vol = np.sqrt(np.mean(data_int16.astype(np.float32)**2)) / 32768.0
-        
-        if vol > 0.005: # Only print if there is sound
-            print(f"🎤 Audio Level: {vol:.4f}", end="\r")
-
-        # 1. VAD Check
-        vad_results = vad_stream.push_frame(event.frame)
-        audio_buffer.append(data_int16)
-
-        # 2. Process Results
-        for res in (vad_results or []):
-            if res.type == silero.VADEventType.START_OF_SPEECH:
+    def mark_speech(start, end):
+        # Flags the buffered frames overlapping [start, end) in track samples
+        first = max(bisect.bisect_right(frame_starts, start) - 1, 0)
+        for i in range(first, bisect.bisect_left(frame_starts, end)):
+            speech_flags[i] = True
+
+    # VAD results arrive on the stream, not from push_frame()
+    async def handle_vad():
+        nonlocal audio_buffer, speech_flags, frame_starts, utterance_started_at
+        async for res in vad_stream:
+            if res.type == VADEventType.INFERENCE_DONE:
+                # Raw per-window probability: res.speaking is debounced and stays
+                # True through min_silence_duration, which would defeat trimming.
+                # Windows finish after the frames they cover were buffered, so
+                # flag those frames by sample position, not arrival order.
+                if res.probability >= VAD_OPTIONS["activation_threshold"]:
+                    window_samples = SILERO_WINDOW * 48000 // SILERO_SAMPLE_RATE
+                    mark_speech(res.samples_index - window_samples, res.samples_index)
+
+            elif res.type == VADEventType.START_OF_SPEECH:
                 print("\n🗣️  Started speaking...")
+                # The event fires once min_speech_duration of speech has passed
+                utterance_started_at = time.time() - res.speech_duration
                 if len(audio_buffer) > 10:
                     audio_buffer = audio_buffer[-10:] # Keep 200ms pre-roll
+                    speech_flags = speech_flags[-10:]
+                    frame_starts = frame_starts[-10:]
             
-            elif res.type == silero.VADEventType.END_OF_SPEECH:
+            elif res.type == VADEventType.END_OF_SPEECH:
                 print("✅ Finished speaking. Transcribing...")
                 
                 if audio_buffer:
-                    full_audio_48k = np.concatenate(audio_buffer)
+                    # Trim to the speech span before resampling, NR and Whisper.
+                    # The resampler delays windows by a few ms; the trim margin covers it.
+                    full_audio_48k = trim_utterance(audio_buffer, speech_flags)
                     audio_buffer = [] 
+                    speech_flags = []
+                    frame_starts = []
                     
-                    await main_loop.run_in_executor(
-                        None, 
-                        lambda: process_audio_chunk(full_audio_48k, room, main_loop)
-                    )
-
-        # 3. Buffer Safety
-        if len(audio_buffer) > MAX_BUFFER_FRAMES:
-            audio_buffer = audio_buffer[-100:]
+                    # Not awaited, so VAD events keep flowing while Whisper runs
+                    level = quality.level
+                    started_at = utterance_started_at
+                    asyncio.create_task(quality.run_in_executor(
+                        lambda: process_audio_chunk(full_audio_48k, participant_identity, publisher, main_loop, level, started_at)
+                    ))
+
+    vad_task = asyncio.create_task(handle_vad())
+    logger.info("Pipeline Started (Debug Mode)")
 
-def process_audio_chunk(audio_data_48k, room, loop):
     try:
-        # A. Resample 48k -> 16k
-        samples_16k = int(len(audio_data_48k) * 16000 / 48000)
-        audio_16k = signal.resample(audio_data_48k, samples_16k)
-        audio_float32 = audio_16k.astype(np.float32) / 32768.0
-
-        # B. Noise Reduction
-        reduced_audio = nr.reduce_noise(y=audio_float32, sr=16000, stationary=True, prop_decrease=0.75)
-
-        # C. Whisper
-        result = model.transcribe(reduced_audio, fp16=False)
-        text = result['text'].strip()
+        async for event in audio_stream:
+            # --- DEBUG: Print Audio Volume ---
+            # This proves if Python is actually hearing you
+            data_int16 = np.frombuffer(event.frame.data, dtype=np.int16)
+            vol = np.sqrt(np.mean(data_int16.astype(np.float32)**2)) / 32768.0
+            
+            if vol > 0.005: # Only print if there is sound
+                print(f"🎤 Audio Level: {vol:.4f}", end="\r")
+
+            # 1. VAD Check
+            vad_stream.push_frame(event.frame)
+            audio_buffer.append(data_int16)
+            speech_flags.append(False)
+            frame_starts.append(samples_pushed)
+            samples_pushed += event.frame.samples_per_channel
+
+            # 2. Buffer Safety
+            if len(audio_buffer) > MAX_BUFFER_FRAMES:
+                audio_buffer = audio_buffer[-100:]
+                speech_flags = speech_flags[-100:]
+                frame_starts = frame_starts[-100:]
+    finally:
+        await vad_stream.aclose()
+        vad_task.cancel()
+
+def process_audio_chunk(audio_data_48k, participant_identity, publisher, loop, level, started_at=None):
+    try:
+        start = time.perf_counter()
+
+        if level["backend"] == "groq":
+            # Offload under heavy load; runs on the event loop, we just wait for it
+            from groq_stt import groq_client, transcribe_with_groq
+            text = asyncio.run_coroutine_threadsafe(
+                transcribe_with_groq(groq_client(), audio_data_48k, 48000), loop
+            ).result()
+        else:
+            # A. Resample 48k -> 16k
+            samples_16k = int(len(audio_data_48k) * 16000 / 48000)
+            audio_16k = signal.resample(audio_data_48k, samples_16k)
+            audio_float32 = audio_16k.astype(np.float32) / 32768.0
+
+            # B. Noise Reduction (first thing dropped under load)
+            if level["noise_reduction"]:
+                audio_float32 = nr.reduce_noise(y=audio_float32, sr=16000, stationary=True, prop_decrease=0.75)
+
+            # C. Whisper
+            result = whisper_model(level["model"]).transcribe(audio_float32, beam_size=level["beam_size"])
+            text = result['text'].strip()
+
+        loop.call_soon_threadsafe(quality.report, time.perf_counter() - start, len(audio_data_48k) / 48000, level)
         
         if text:
             print(f"📝 Transcribed: {text}")
-            asyncio.run_coroutine_threadsafe(
-                room.local_participant.publish_data(text, reliable=True),
-                loop
-            )
+            # Publisher state lives on the event loop, not this worker thread
+            loop.call_soon_threadsafe(publisher.final, participant_identity, text, started_at)
             
     except Exception as e:
         print(f"Processing Error: {e}")
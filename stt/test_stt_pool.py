@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+
+import aiohttp
+import numpy as np
+from livekit import rtc
+from livekit.agents import APIConnectOptions, stt
+from livekit.plugins import deepgram
+
+from fake_stt_server import FakeSTTServer
+from stt_pool import WarmStreamPool, STTSession
+
+# Runs WarmStreamPool against fake_stt_server.py through the real Deepgram
+# plugin: warm claims, keepalive replacement of dropped sessions, and
+# reconnect backoff when every session is rejected. Works under pytest or
+# as a script.
+
+logging.basicConfig(level=logging.INFO)
+
+SAMPLE_RATE = 48000
+
+
+class NoRetrySTT:
+    """Fails a stream on the first connection error instead of after the plugin's retries."""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def stream(self):
+        return self.provider.stream(conn_options=APIConnectOptions(max_retry=0, timeout=2.0))
+
+
+def frames(seconds, tone=True):
+    samples = SAMPLE_RATE // 100
+    t = np.arange(samples) / SAMPLE_RATE
+    data = (np.sin(2 * np.pi * 440 * t) * 0.3 * 32767).astype(np.int16) if tone else np.zeros(samples, np.int16)
+    for _ in range(int(seconds * 100)):
+        yield rtc.AudioFrame(data.tobytes(), SAMPLE_RATE, 1, samples)
+
+
+def deepgram_provider(server, http_session):
+    return NoRetrySTT(deepgram.STT(
+        model="nova-2",
+        api_key="fake",
+        base_url=server.url,
+        http_session=http_session,
+    ))
+
+
+def run_with_http_session(check):
+    async def run():
+        async with aiohttp.ClientSession() as http_session:
+            await check(http_session)
+    asyncio.run(run())
+
+
+async def warm_claim(http_session):
+    server = await FakeSTTServer().start()
+    pool = WarmStreamPool(deepgram_provider(server, http_session), size=2, keepalive_interval=0.5).start()
+    try:
+        await asyncio.sleep(1.5)
+        assert server.active == 2, server.stats()
+
+        subscribed_at = time.perf_counter()
+        # Claimed after the idle reader has been draining it for a while
+        stream = await pool.claim()
+        assert stream.warm and stream.keepalive_seconds > 0, (stream.warm, stream.keepalive_seconds)
+
+        for frame in frames(1.0):
+            stream.push_frame(frame)
+        for frame in frames(1.0, tone=False):
+            stream.push_frame(frame)
+
+        async def first_final():
+            async for event in stream:
+                if event.type in (stt.SpeechEventType.INTERIM_TRANSCRIPT, stt.SpeechEventType.FINAL_TRANSCRIPT):
+                    if not pool.first_transcript["warm"]:
+                        pool.report_first_transcript(time.perf_counter() - subscribed_at, stream.warm)
+                if event.type == stt.SpeechEventType.FINAL_TRANSCRIPT:
+                    return event.alternatives[0].text
+
+        final = await asyncio.wait_for(first_final(), timeout=5)
+        assert final, "no final transcript"
+        await stream.aclose()
+
+        # The claim was refilled without waiting for the keepalive tick
+        assert pool.stats()["idle"] == 2 and pool.opened == 3, pool.stats()
+        print(f"warm claim: final={final!r} pool={pool.stats()} server={server.stats()}")
+    finally:
+        await pool.aclose()
+        await server.aclose()
+
+
+async def dropped_idle_replaced(http_session):
+    server = await FakeSTTServer(drop_after=0.4).start()
+    pool = WarmStreamPool(deepgram_provider(server, http_session), size=2, keepalive_interval=0.3).start()
+    try:
+        await asyncio.sleep(3.0)
+        assert pool.replaced >= 2, pool.stats()
+        assert server.active <= 2, server.stats()
+        print(f"dropped idle: pool={pool.stats()} server={server.stats()}")
+    finally:
+        await pool.aclose()
+        await server.aclose()
+
+
+async def reconnect_backs_off(http_session):
+    server = await FakeSTTServer(reject=True).start()
+    pool = WarmStreamPool(deepgram_provider(server, http_session), size=2, keepalive_interval=0.3).start()
+    try:
+        # The agents' loop: STTSession reconnects whenever a stream ends
+        session = await STTSession(pool).start()
+
+        async def drain():
+            async for _ in session:
+                pass
+
+        try:
+            await asyncio.wait_for(drain(), timeout=5.0)
+        except asyncio.TimeoutError:
+            pass
+        await session.aclose()
+
+        # Without backoff this is one attempt per failed handshake, forever
+        assert server.attempts < 30, server.stats()
+        assert session.failures >= 3, session.failures
+        print(f"rejected: {session.failures} failures in a row, pool={pool.stats()} server={server.stats()}")
+    finally:
+        await pool.aclose()
+        await server.aclose()
+
+
+def test_warm_claim():
+    run_with_http_session(warm_claim)
+
+
+def test_dropped_idle_replaced():
+    run_with_http_session(dropped_idle_replaced)
+
+
+def test_reconnect_backs_off():
+    run_with_http_session(reconnect_backs_off)
+
+
+if __name__ == "__main__":
+    test_warm_claim()
+    test_dropped_idle_replaced()
+    test_reconnect_backs_off()
+    print("OK")
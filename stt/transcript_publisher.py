@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger("transcript-publisher")
+
+# Interims are superseded by the next one, so they go out lossy on their own
+# topic; finals go reliable so no caption is ever missing.
+INTERIM_TOPIC = "transcript.interim"
+FINAL_TOPIC = "transcript.final"
+
+# Stay well under the data channel packet limit
+MAX_PAYLOAD_BYTES = 14_000
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class TranscriptPublisher:
+    """Publishes live captions on the LiveKit data channel.
+
+    Every tick the latest interim per participant (older ones are dropped)
+    is sent as one lossy batch, at most once per `interim_interval`; all
+    finals queued since the last tick are sent as one reliable batch, and
+    any that fail to send are retried on the next tick.
+
+    Callers that know when the utterance began (epoch seconds) pass it as
+    `started_at`; otherwise the first record of the utterance stamps it.
+
+    Each record is compact JSON:
+        {"p": participant, "u": utterance id, "f": 0|1, "t": text,
+         "s": utterance start (epoch ms), "e": emitted at (epoch ms)}
+    and a packet is {"r": [record, ...]}.
+    """
+
+    def __init__(self, room, interim_interval=0.25, tick_interval=0.1):
+        self.room = room
+        self.interim_interval = interim_interval
+        self.tick_interval = tick_interval
+
+        self._pending_interims = {}
+        self._pending_finals = []
+        self._utterance_ids = {}
+        self._utterance_starts = {}
+        self._last_interim_sent = 0.0
+        self._task = None
+
+        self.interims_received = 0
+        self.interims_sent = 0
+        self.finals_sent = 0
+        self.packets_sent = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush(force_interims=False)
+
+    def _record(self, participant, text, is_final, started_at=None):
+        utterance_id = self._utterance_ids.get(participant, 0)
+        if started_at is not None:
+            self._utterance_starts[participant] = int(started_at * 1000)
+        start = self._utterance_starts.setdefault(participant, _now_ms())
+        return {
+            "p": participant,
+            "u": utterance_id,
+            "f": 1 if is_final else 0,
+            "t": text,
+            "s": start,
+            "e": _now_ms(),
+        }
+
+    def interim(self, participant, text, started_at=None):
+        if not text:
+            return
+        self.interims_received += 1
+        self._pending_interims[participant] = self._record(participant, text, False, started_at)
+
+    def final(self, participant, text, started_at=None):
+        if text:
+            self._pending_finals.append(self._record(participant, text, True, started_at))
+        # The final supersedes any interim still waiting for this utterance
+        self._pending_interims.pop(participant, None)
+        self._utterance_ids[participant] = self._utterance_ids.get(participant, 0) + 1
+        self._utterance_starts.pop(participant, None)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Transcript publish failed: {e}")
+
+    async def flush(self, force_interims=True):
+        if self._pending_finals:
+            finals, self._pending_finals = self._pending_finals, []
+            sent = 0
+            try:
+                for batch in self._batches(finals):
+                    await self._send(batch, reliable=True, topic=FINAL_TOPIC)
+                    sent += len(batch)
+            finally:
+                # Unsent finals go back ahead of any queued meanwhile
+                self._pending_finals[:0] = finals[sent:]
+                self.finals_sent += sent
+
+        now = time.monotonic()
+        if (
+            force_interims
+            and self._pending_interims
+            and now - self._last_interim_sent >= self.interim_interval
+        ):
+            interims = list(self._pending_interims.values())
+            self._pending_interims.clear()
+            self._last_interim_sent = now
+            for batch in self._batches(interims):
+                await self._send(batch, reliable=False, topic=INTERIM_TOPIC)
+            self.interims_sent += len(interims)
+
+    def _batches(self, records):
+        """Encoded records split into packets under MAX_PAYLOAD_BYTES, in order."""
+        batches = [[]]
+        size = 0
+        for record in records:
+            encoded = json.dumps(record, separators=(",", ":"))
+            if batches[-1] and size + len(encoded) > MAX_PAYLOAD_BYTES:
+                batches.append([])
+                size = 0
+            batches[-1].append(encoded)
+            size += len(encoded) + 1
+        return [batch for batch in batches if batch]
+
+    async def _send(self, encoded_records, reliable, topic):
+        payload = '{"r":[' + ",".join(encoded_records) + "]}"
+        await self.room.local_participant.publish_data(
+            payload.encode("utf-8"), reliable=reliable, topic=topic
+        )
+        self.packets_sent += 1
+
+    def stats(self):
+        return {
+            "interims_received": self.interims_received,
+            "interims_sent": self.interims_sent,
+            "finals_sent": self.finals_sent,
+            "packets_sent": self.packets_sent,
+        }
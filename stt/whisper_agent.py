@@ -1,11 +1,18 @@
 import asyncio
 import logging
 import os
+import time
 import numpy as np
-import whisper
 from livekit import rtc, api
-from livekit.plugins import noise_cancellation
 from dotenv import load_dotenv
+from transcript_publisher import TranscriptPublisher
+from startup import Startup, load_whisper, warm_up_whisper
+from model_registry import registry
+from frame_pipeline import FramePipeline, NEVER_DROP
+from recorder import MmapRecorder, recording_dir
+from speculation import SpeculativeTranscriber
+from segments import trim_utterance
+from quality import QualityController, effective_levels, local_model_sizes
 
 load_dotenv()
 
@@ -14,22 +21,43 @@ logger = logging.getLogger("local-whisper")
 
 ROOM_NAME = "my-room"
 
-# Load model once at startup
-print("Loading Whisper model...")
-model = whisper.load_model("base")
-print("Model loaded.")
+MIN_VOLUME = 0.01
+SILENCE_DURATION = 1.0
+SPECULATIVE_PAUSE = 0.25     # Start transcribing after this much silence (None = off)
+
+# ~10 s of 10 ms frames; STT never drops, ingestion waits instead
+STT_QUEUE_FRAMES = 1000
+RECORD_QUEUE_FRAMES = 500   # The recorder only enqueues, so this never fills up
+
+RECORD_DIR = os.getenv("RECORD_DIR")   # Set to record each track (see recorder.py)
+
+# Picks model size / beam / cloud offload for each utterance from current load
+quality = None
+
+def whisper_model(size, startup=None):
+    return registry.get(f"whisper:{size}", lambda: load_whisper(size, startup))
 
 async def main():
+    global quality
+    startup = Startup("local-whisper")
+    # Every size a quality level can switch to is loaded and warmed up before
+    # the agent joins the room, so a step down never pays a cold load
+    for size in local_model_sizes():
+        warm_up_whisper(whisper_model(size, startup), startup)
+    # No noise reduction here, so levels that only drop it are skipped
+    quality = QualityController(levels=effective_levels(noise_reduction=False)).start()
+
     agent_source = rtc.AudioSource(48000, 1)
     agent_track = rtc.LocalAudioTrack.create_audio_track("denoised_output", agent_source)
 
     room = rtc.Room()
+    publisher = TranscriptPublisher(room).start()
 
     @room.on("track_subscribed")
     def on_track_subscribed(track, publication, participant):
         if track.kind == rtc.TrackKind.KIND_AUDIO and participant.identity != "python-agent":
             logger.info(f"Detected audio from {participant.identity}")
-            asyncio.create_task(process_track(track, room, agent_source))
+            asyncio.create_task(process_track(track, participant.identity, publisher, agent_source))
 
     token = api.AccessToken(
         os.getenv("LIVEKIT_API_KEY"),
@@ -42,6 +70,7 @@ async def main():
     try:
         await room.connect(os.getenv("LIVEKIT_URL"), token)
         logger.info("Connected.")
+        startup.ready()
     except Exception as e:
         logger.error(f"Failed to connect: {e}")
         return
@@ -49,67 +78,122 @@ async def main():
     await room.local_participant.publish_track(agent_track)
     await asyncio.Event().wait()
 
-async def process_track(track, room, audio_source):
-    clean_stream = rtc.AudioStream(track, noise_cancellation=noise_cancellation.BVC())
+async def process_track(track, participant_identity, publisher, audio_source):
+    clean_stream = rtc.AudioStream(track, noise_cancellation=registry.bvc())
+    logger.info(f"Models: {registry.stats()}")
+
+    # Whisper runs in an executor thread, so a discarded speculation can't be
+    # interrupted; it finishes in the background and counts as wasted compute
+    speculator = SpeculativeTranscriber(transcribe_with_whisper, cancellable=False)
     
+    # Optional raw recording, with utterance boundaries on the same audio clock
+    recording = None
+    if RECORD_DIR:
+        recording = MmapRecorder(recording_dir(RECORD_DIR, participant_identity, track.sid))
+
     audio_buffer = [] 
-    MIN_VOLUME = 0.01
-    SILENCE_DURATION = 1.0
+    speech_flags = []      # VAD decision for each buffered frame
     
-    last_speech_time = asyncio.get_event_loop().time()
+    # Audio clock (seconds of audio consumed), so a queue backlog doesn't
+    # distort the silence timing
+    audio_time = 0.0
+    last_speech_time = 0.0
+    utterance_start = 0.0
     is_speaking = False
 
+    # --- AUDIO PLAYBACK DISABLED ---
+    # Only the STT consumer is attached; its queue absorbs frames while
+    # Whisper is busy instead of stalling frame ingestion.
+    async def transcribe(frame):
+        nonlocal audio_buffer, speech_flags, audio_time, last_speech_time, utterance_start, is_speaking
+
+        # Convert to numpy and calculate volume (RMS)
+        data_int16 = np.frombuffer(frame.data, dtype=np.int16)
+        volume = np.sqrt(np.mean(data_int16.astype(np.float32)**2)) / 32768.0
+        
+        audio_time += frame.samples_per_channel / frame.sample_rate
+        current_time = audio_time
+
+        # Logic: If loud enough, add to buffer. If silent for X seconds, process buffer.
+        if volume > MIN_VOLUME:
+            if not is_speaking:
+                is_speaking = True
+                utterance_start = current_time - frame.samples_per_channel / frame.sample_rate
+                print("Speaking...", end="\r")
+            # Speech resumed: the speculative result is for a partial turn
+            speculator.discard()
+            last_speech_time = current_time
+            audio_buffer.append(data_int16)
+            speech_flags.append(True)
+        else:
+            if is_speaking:
+                audio_buffer.append(data_int16)
+                speech_flags.append(False)
+                silence = current_time - last_speech_time
+
+                # Short pause: start transcribing what we have so far
+                if SPECULATIVE_PAUSE is not None and silence > SPECULATIVE_PAUSE and not speculator.pending:
+                    speculator.speculate(trim_utterance(audio_buffer, speech_flags))
+
+                if silence > SILENCE_DURATION:
+                    is_speaking = False
+                    
+                    if audio_buffer:
+                        # Merge buffer, keeping only the speech span (plus margin)
+                        full_audio = trim_utterance(audio_buffer, speech_flags)
+                        audio_buffer = []
+                        speech_flags = []
+                        if recording is not None:
+                            recording.mark_utterance(utterance_start, current_time)
+                        # Wall-clock start, from how much audio has passed since
+                        started_at = time.time() - (current_time - utterance_start)
+
+                        text = await speculator.commit(full_audio)
+                        if text:
+                            logger.info(f"Transcribed: {text}")
+                            publisher.final(participant_identity, text, started_at)
+
+    pipeline = FramePipeline(clean_stream, name=participant_identity)
+    pipeline.add_consumer("stt", transcribe, maxsize=STT_QUEUE_FRAMES, policy=NEVER_DROP)
+    if recording is not None:
+        pipeline.add_consumer("record", recording, maxsize=RECORD_QUEUE_FRAMES, policy=NEVER_DROP)
+
     logger.info("Pipeline Started")
 
     try:
-        async for event in clean_stream:
-            # --- AUDIO PLAYBACK DISABLED ---
-            # await audio_source.capture_frame(event.frame)
-
-            frame = event.frame
-            
-            # Convert to numpy and calculate volume safely
-            data_int16 = np.frombuffer(frame.data, dtype=np.int16)
-            data_float = data_int16.astype(np.float32)
-            volume = np.sqrt(np.mean(data_float**2)) / 32768.0
-            
-            current_time = asyncio.get_event_loop().time()
-
-            # Logic: If loud enough, add to buffer. If silent for X seconds, process buffer.
-            if volume > MIN_VOLUME:
-                if not is_speaking:
-                    is_speaking = True
-                    print("Speaking...", end="\r")
-                last_speech_time = current_time
-                audio_buffer.append(data_int16)
-            else:
-                if is_speaking:
-                    audio_buffer.append(data_int16)
-                    if current_time - last_speech_time > SILENCE_DURATION:
-                        is_speaking = False
-                        
-                        if audio_buffer:
-                            # 1. Merge buffer
-                            full_audio = np.concatenate(audio_buffer)
-                            audio_buffer = []
-                            
-                            # 2. Convert to float32 (Whisper requirement)
-                            audio_float32 = full_audio.astype(np.float32) / 32768.0
-
-                            # 3. Resample 48k -> 16k (Whisper requirement)
-                            if frame.sample_rate == 48000:
-                                audio_float32 = audio_float32[::3]
-
-                            # 4. Run Whisper in executor (Blocking call moved to background)
-                            loop = asyncio.get_event_loop()
-                            result = await loop.run_in_executor(None, lambda: model.transcribe(audio_float32, fp16=False))
-                            
-                            text = result['text'].strip()
-                            if text:
-                                logger.info(f"Transcribed: {text}")
-                                await room.local_participant.publish_data(text, reliable=True)
+        await pipeline.run()
     except Exception as e:
         logger.error(f"Error: {e}")
+    finally:
+        if recording is not None:
+            await asyncio.to_thread(recording.close)
+        speculator.discard()
+        logger.info(f"Speculation: {speculator.stats()}")
+
+async def transcribe_with_whisper(audio_int16_48k):
+    level = quality.level
+    start = time.perf_counter()
+
+    if level["backend"] == "groq":
+        # Offload under heavy load; imported lazily since it's rarely used
+        from groq_stt import groq_client, transcribe_with_groq
+        text = await transcribe_with_groq(groq_client(), audio_int16_48k, 48000)
+    else:
+        # 1. Convert to float32 (Whisper requirement)
+        audio_float32 = audio_int16_48k.astype(np.float32) / 32768.0
+
+        # 2. Resample 48k -> 16k (Whisper requirement)
+        audio_float32 = audio_float32[::3]
+
+        # 3. Run Whisper in executor (Blocking call moved to background)
+        model = whisper_model(level["model"])
+        result = await quality.run_in_executor(
+            lambda: model.transcribe(audio_float32, beam_size=level["beam_size"])
+        )
+        text = result['text'].strip()
+
+    quality.report(time.perf_counter() - start, len(audio_int16_48k) / 48000, level)
+    return text
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,79 @@
+import os
+
+# "openai-whisper" (PyTorch) or "faster-whisper" (CTranslate2, int8 on CPU)
+WHISPER_ENGINE = os.getenv("WHISPER_ENGINE", "openai-whisper")
+
+# Intra-op threads per worker process; keep workers x threads <= cores
+WHISPER_THREADS = int(os.getenv("WHISPER_THREADS", "0")) or None
+
+# Decoding used by both engines, so switching engine changes speed, not the search.
+# 1 = greedy; an empty WHISPER_LANGUAGE lets Whisper detect the language.
+WHISPER_BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "5"))
+WHISPER_LANGUAGE = os.getenv("WHISPER_LANGUAGE", "en") or None
+
+
+class OpenAIWhisperEngine:
+    """openai-whisper on CPU in fp32 (the original engine)."""
+
+    name = "openai-whisper"
+
+    def __init__(self, size="base", download_root=None, threads=None):
+        import torch
+        import whisper
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.size = size
+        self.model = whisper.load_model(size, download_root=download_root)
+
+    def transcribe(self, audio, beam_size=None):
+        beam_size = beam_size or WHISPER_BEAM_SIZE
+        options = {"fp16": False, "language": WHISPER_LANGUAGE}
+        # Without a beam_size openai-whisper decodes greedily
+        if beam_size > 1:
+            options["beam_size"] = beam_size
+        result = self.model.transcribe(audio, **options)
+        return {
+            "text": result["text"],
+            "segments": [
+                {"start": s["start"], "end": s["end"], "text": s["text"]}
+                for s in result["segments"]
+            ],
+        }
+
+
+class FasterWhisperEngine:
+    """Same Whisper sizes through CTranslate2 with int8 weights on CPU."""
+
+    name = "faster-whisper"
+
+    def __init__(self, size="base", download_root=None, threads=None, compute_type="int8"):
+        from faster_whisper import WhisperModel
+
+        self.size = size
+        self.model = WhisperModel(
+            size,
+            device="cpu",
+            compute_type=compute_type,
+            cpu_threads=threads or 0,
+            download_root=download_root,
+        )
+
+    def transcribe(self, audio, beam_size=None):
+        segments, _info = self.model.transcribe(audio, beam_size=beam_size or WHISPER_BEAM_SIZE, language=WHISPER_LANGUAGE)
+        # The generator decodes lazily; consume it here, inside the worker thread
+        segments = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+        return {"text": "".join(s["text"] for s in segments), "segments": segments}
+
+
+ENGINES = {
+    OpenAIWhisperEngine.name: OpenAIWhisperEngine,
+    FasterWhisperEngine.name: FasterWhisperEngine,
+}
+
+
+def create_engine(engine=None, size="base", download_root=None, threads=None):
+    engine = engine or WHISPER_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown Whisper engine {engine!r}; choose from {sorted(ENGINES)}")
+    return ENGINES[engine](size, download_root=download_root, threads=threads or WHISPER_THREADS)
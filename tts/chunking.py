@@ -0,0 +1,119 @@
+import re
+
+# A period after these doesn't end a sentence
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "inc",
+    "ltd", "co", "corp", "fig", "approx", "dept", "est", "mt", "gen",
+    "col", "lt", "sgt", "capt", "e.g", "i.e", "u.s", "u.k", "a.m", "p.m",
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct",
+    "nov", "dec",
+}
+
+# Only abbreviations when a number follows ("No. 5"), not in "he said no."
+NUMBER_ABBREVIATIONS = {"no", "nos"}
+
+NONE, WEAK, STRONG = 0, 1, 2
+
+_TOKEN = re.compile(r"\n+|[^\s]+")
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*$")
+_CLAUSE_END = re.compile(r"([,;:]|—|--)[\"')\]]*$")
+
+
+def tokenize(text):
+    """Splits text into words, each tagged with the boundary strength after it.
+
+    STRONG: sentence end or line break. WEAK: comma, semicolon, colon, dash.
+    Punctuation must be followed by whitespace to count, so "3.5" and
+    "1,000" stay whole, and periods after abbreviations or initials are
+    ignored.
+    """
+    words = []
+    tokens = [match.group(0) for match in _TOKEN.finditer(text)]
+    for i, token in enumerate(tokens):
+        if token.startswith("\n"):
+            if words:
+                words[-1] = (words[-1][0], STRONG)
+            continue
+
+        strength = NONE
+        if _SENTENCE_END.search(token):
+            stem = token.rstrip("\"')]").rstrip(".!?").lower()
+            following = tokens[i + 1] if i + 1 < len(tokens) else ""
+            is_abbreviation = token.rstrip("\"')]").endswith(".") and (
+                stem in ABBREVIATIONS
+                or (stem in NUMBER_ABBREVIATIONS and following[:1].isdigit())
+                or (len(stem) == 1 and stem.isalpha())
+            )
+            strength = NONE if is_abbreviation else STRONG
+        elif _CLAUSE_END.search(token) or token in ("-", "–"):
+            strength = WEAK
+        words.append((token, strength))
+    return words
+
+
+class AdaptiveChunker:
+    """Hands out TTS chunks sized to how much audio the client has buffered.
+
+    The first chunk is deliberately short: it ends at the first clause or
+    sentence boundary after `first_min_words`, or at `first_max_words`.
+    Each later chunk gets a word budget of what can be synthesised before
+    the client's buffer runs dry:
+        budget = buffered_seconds * safety / seconds_per_word
+    clamped to [min_words, max_words], and is cut at the last sentence
+    boundary in the budget, else the last clause boundary, else the cap.
+    """
+
+    def __init__(self, text, first_min_words=3, first_max_words=10,
+                 min_words=6, max_words=60, safety=0.7):
+        self.words = tokenize(text)
+        self.first_min_words = first_min_words
+        self.first_max_words = first_max_words
+        self.min_words = min_words
+        self.max_words = max_words
+        self.safety = safety
+        self.position = 0
+        self.chunk_sizes = []
+
+    @property
+    def done(self):
+        return self.position >= len(self.words)
+
+    def _budget(self, buffered_seconds, seconds_per_word):
+        if not self.chunk_sizes:
+            return self.first_max_words
+        if not seconds_per_word:
+            # No synthesis timing yet: grow geometrically from the last chunk
+            return max(self.min_words, min(self.max_words, self.chunk_sizes[-1] * 2))
+        budget = int(buffered_seconds * self.safety / seconds_per_word)
+        return max(self.min_words, min(self.max_words, budget))
+
+    def next_chunk(self, buffered_seconds=0.0, seconds_per_word=None):
+        if self.done:
+            return None
+
+        start = self.position
+        budget = self._budget(buffered_seconds, seconds_per_word)
+        end = min(start + budget, len(self.words))
+
+        if end < len(self.words):
+            if not self.chunk_sizes:
+                # First chunk: earliest boundary that isn't uselessly short
+                for i in range(start + self.first_min_words - 1, end):
+                    if self.words[i][1] != NONE:
+                        end = i + 1
+                        break
+            else:
+                shortest = start + max(1, budget // 3)
+                cut = None
+                for strength in (STRONG, WEAK):
+                    for i in range(end - 1, shortest - 2, -1):
+                        if self.words[i][1] == strength:
+                            cut = i + 1
+                            break
+                    if cut:
+                        break
+                end = cut or end
+
+        self.position = end
+        self.chunk_sizes.append(end - start)
+        return " ".join(word for word, _ in self.words[start:end])
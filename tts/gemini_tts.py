@@ -1,11 +1,10 @@
 import os
-import pyaudio
 from google import genai
 from google.genai import types
+from playout import Playout, PyAudioSink
 
-# Audio setup
-p = pyaudio.PyAudio()
-stream = p.open(format=pyaudio.paInt16, channels=1, rate=24000, output=True)
+# Audio setup: the network loop fills a jitter buffer, PyAudio's callback drains it
+playout = Playout(PyAudioSink(sample_rate=24000), sample_rate=24000)
 
 client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
 
@@ -30,11 +29,10 @@ response_stream = client.models.generate_content_stream(
     )
 )
 
-for chunk in response_stream:
-    for part in chunk.candidates[0].content.parts:
-        if part.inline_data:
-            stream.write(part.inline_data.data)
+with playout:
+    for chunk in response_stream:
+        for part in chunk.candidates[0].content.parts:
+            if part.inline_data:
+                playout.feed(part.inline_data.data)
 
-stream.stop_stream()
-stream.close()
-p.terminate()
\ No newline at end of file
+print(f"Playout stats: {playout.stats}")
@@ -1,7 +1,8 @@
 import modal
-import sounddevice as sd
+import numpy as np
 import soundfile as sf
 from kokoro import KPipeline
+from playout import Playout, SoundDeviceSink
 
 print("Loading model...")
 pipeline = KPipeline(lang_code='a')
@@ -9,7 +10,12 @@ text = "Kokoro is an open-weight TTS model with 82 million parameters. Despite i
 
 generator = pipeline(text, voice='af_heart', speed=1.0, split_pattern=r'\n+')
 
-for i, (gs, ps, audio) in enumerate(generator):
-    sd.play(audio, 24000)
-    sd.wait()
-    sf.write(f'{i}.wav', audio, 24000)
\ No newline at end of file
+# Segments are queued for a callback-driven output stream, so generating the
+# next segment overlaps with playing the current one
+with Playout(SoundDeviceSink(sample_rate=24000), sample_rate=24000) as playout:
+    for i, (gs, ps, audio) in enumerate(generator):
+        audio = np.asarray(audio, dtype=np.float32)
+        playout.feed((np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes())
+        sf.write(f'{i}.wav', audio, 24000)
+
+print(f"Playout stats: {playout.stats}")
@@ -0,0 +1,319 @@
+import collections
+import threading
+import time
+
+
+class JitterBuffer:
+    """Byte FIFO between a network receive loop and an audio output callback.
+
+    The receive side calls push() as chunks arrive; the output callback calls
+    read() for a fixed number of bytes. Playback only starts (and restarts
+    after an underrun) once the buffered audio reaches the target depth, and
+    the target depth follows the measured chunk inter-arrival jitter.
+    """
+
+    def __init__(self, sample_rate=24000, sample_width=2, channels=1,
+                 min_depth_ms=80, max_depth_ms=1500, jitter_multiplier=3.0):
+        self.sample_rate = sample_rate
+        self.bytes_per_ms = sample_rate * sample_width * channels / 1000.0
+        self.frame_bytes = sample_width * channels
+        self.min_depth_ms = min_depth_ms
+        self.max_depth_ms = max_depth_ms
+        self.jitter_multiplier = jitter_multiplier
+
+        self._chunks = collections.deque()
+        self._head_offset = 0
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._readable = threading.Condition(self._lock)
+        self._drained = threading.Event()
+
+        self._playing = False
+        self._ended = False
+        self._received_ms = 0.0
+        self._min_transit_ms = None
+        self.jitter_ms = 0.0
+
+        self.chunks_received = 0
+        self.bytes_received = 0
+        self.bytes_played = 0
+        self.underruns = 0
+        self.silence_ms = 0.0
+
+    @property
+    def target_depth_ms(self):
+        depth = self.min_depth_ms + self.jitter_multiplier * self.jitter_ms
+        return max(self.min_depth_ms, min(self.max_depth_ms, depth))
+
+    @property
+    def buffered_ms(self):
+        return self._buffered / self.bytes_per_ms
+
+    def push(self, data, now=None):
+        if not data:
+            return
+        now = time.monotonic() if now is None else now
+        chunk_ms = len(data) / self.bytes_per_ms
+
+        with self._lock:
+            # Transit: arrival time minus the audio time the chunk starts at.
+            # Lateness is how far behind the earliest transit seen so far
+            # this chunk is, i.e. how far arrivals have fallen behind the
+            # playout clock. A source running ahead of real time (TTS usually
+            # does) only lowers the minimum, so bursts never count as jitter.
+            transit_ms = now * 1000.0 - self._received_ms
+            if self._min_transit_ms is None or transit_ms < self._min_transit_ms:
+                self._min_transit_ms = transit_ms
+            lateness = transit_ms - self._min_transit_ms
+            # Smoothed like the RFC 3550 jitter estimator
+            self.jitter_ms += (lateness - self.jitter_ms) / 16.0
+            self._received_ms += chunk_ms
+
+            self._chunks.append(bytes(data))
+            self._buffered += len(data)
+            self.chunks_received += 1
+            self.bytes_received += len(data)
+            self._drained.clear()
+            self._readable.notify_all()
+
+    def end(self):
+        """Marks the end of the stream so the tail plays without waiting for depth."""
+        with self._lock:
+            self._ended = True
+            if self._buffered == 0:
+                self._drained.set()
+            self._readable.notify_all()
+
+    def read(self, nbytes):
+        """Returns exactly nbytes, padding with silence when the buffer is short."""
+        with self._lock:
+            if not self._playing:
+                if self._buffered == 0 or (
+                    not self._ended and self.buffered_ms < self.target_depth_ms
+                ):
+                    self.silence_ms += nbytes / self.bytes_per_ms
+                    return b"\x00" * nbytes
+                self._playing = True
+
+            out = self._take(nbytes)
+
+            if len(out) < nbytes:
+                if not self._ended:
+                    # Ran dry mid-stream: rebuffer up to the target depth
+                    self.underruns += 1
+                    self._playing = False
+                else:
+                    self._drained.set()
+                self.silence_ms += (nbytes - len(out)) / self.bytes_per_ms
+                out += b"\x00" * (nbytes - len(out))
+            elif self._ended and self._buffered == 0:
+                self._drained.set()
+
+            return out
+
+    def _take(self, nbytes):
+        # Keep whole samples so the output never gets misaligned
+        nbytes = min(nbytes, self._buffered)
+        nbytes -= nbytes % self.frame_bytes
+        parts = []
+        remaining = nbytes
+        while remaining > 0:
+            head = self._chunks[0]
+            available = len(head) - self._head_offset
+            take = min(available, remaining)
+            parts.append(head[self._head_offset:self._head_offset + take])
+            self._head_offset += take
+            remaining -= take
+            if self._head_offset == len(head):
+                self._chunks.popleft()
+                self._head_offset = 0
+        self._buffered -= nbytes
+        self.bytes_played += nbytes
+        return b"".join(parts)
+
+    def wait_readable(self, nbytes, timeout=None):
+        """Waits until read(nbytes) would return real audio rather than padding.
+
+        True once nbytes are buffered (and the target depth is reached, if
+        playback hasn't started), or the stream has ended with audio left.
+        """
+        def readable():
+            if self._ended:
+                return self._buffered > 0
+            if not self._playing and self.buffered_ms < self.target_depth_ms:
+                return False
+            return self._buffered >= nbytes
+
+        with self._readable:
+            return self._readable.wait_for(readable, timeout)
+
+    def wait_drained(self, timeout=None):
+        return self._drained.wait(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "chunks": self.chunks_received,
+                "played_ms": round(self.bytes_played / self.bytes_per_ms, 1),
+                "buffered_ms": round(self.buffered_ms, 1),
+                "jitter_ms": round(self.jitter_ms, 1),
+                "target_depth_ms": round(self.target_depth_ms, 1),
+                "underruns": self.underruns,
+                "silence_ms": round(self.silence_ms, 1),
+            }
+
+
+# Sinks are started with the buffer's read() as `pull`; `ready` is the
+# buffer's wait_readable(), which only sinks not driven by a clock need.
+
+class PyAudioSink:
+    """Callback-driven PyAudio output stream (16-bit PCM)."""
+
+    def __init__(self, sample_rate=24000, channels=1, frames_per_buffer=480):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self._pa = None
+        self._stream = None
+
+    def start(self, pull, ready=None):
+        import pyaudio
+
+        frame_bytes = 2 * self.channels
+
+        def callback(in_data, frame_count, time_info, status):
+            return pull(frame_count * frame_bytes), pyaudio.paContinue
+
+        self._pa = pyaudio.PyAudio()
+        self._stream = self._pa.open(
+            format=pyaudio.paInt16,
+            channels=self.channels,
+            rate=self.sample_rate,
+            output=True,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=callback,
+        )
+        self._stream.start_stream()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+        if self._pa is not None:
+            self._pa.terminate()
+
+
+class SoundDeviceSink:
+    """Callback-driven sounddevice raw output stream (16-bit PCM)."""
+
+    def __init__(self, sample_rate=24000, channels=1, frames_per_buffer=480):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self._stream = None
+
+    def start(self, pull, ready=None):
+        import sounddevice as sd
+
+        frame_bytes = 2 * self.channels
+
+        def callback(outdata, frames, time_info, status):
+            outdata[:] = pull(frames * frame_bytes)
+
+        self._stream = sd.RawOutputStream(
+            samplerate=self.sample_rate,
+            channels=self.channels,
+            dtype="int16",
+            blocksize=self.frames_per_buffer,
+            callback=callback,
+        )
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+
+
+class NullSink:
+    """Drains the buffer from a background thread without touching a device.
+
+    With realtime=True it pulls one block per block duration, like a sound
+    card would, silence padding included. Otherwise it pulls a block as soon
+    as one is readable and never pads mid-stream, so `output` is exactly
+    what was pushed plus silence filling out the final block.
+    """
+
+    def __init__(self, sample_rate=24000, channels=1, frames_per_buffer=480, realtime=True):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.realtime = realtime
+        self.output = bytearray()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, pull, ready=None):
+        if not self.realtime and ready is None:
+            raise ValueError("NullSink(realtime=False) needs the buffer's wait_readable as ready")
+        block_bytes = self.frames_per_buffer * 2 * self.channels
+        block_seconds = self.frames_per_buffer / self.sample_rate
+
+        def run():
+            next_tick = time.monotonic()
+            while not self._stop.is_set():
+                if self.realtime:
+                    self.output += pull(block_bytes)
+                    next_tick += block_seconds
+                    self._stop.wait(max(0.0, next_tick - time.monotonic()))
+                elif ready(block_bytes, timeout=0.05):
+                    self.output += pull(block_bytes)
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class Playout:
+    """Feeds a JitterBuffer from the caller and drains it through a sink.
+
+    Usage:
+        with Playout(PyAudioSink(24000), sample_rate=24000) as playout:
+            for chunk in source:
+                playout.feed(chunk)
+    Leaving the block waits for the buffered tail to finish playing and
+    leaves the buffer's stats in `stats`.
+    """
+
+    def __init__(self, sink, sample_rate=24000, channels=1, **buffer_options):
+        self.sink = sink
+        self.buffer = JitterBuffer(sample_rate=sample_rate, channels=channels, **buffer_options)
+        self.stats = None
+
+    def start(self):
+        self.sink.start(self.buffer.read, ready=self.buffer.wait_readable)
+        return self
+
+    def feed(self, data):
+        self.buffer.push(data)
+
+    def finish(self, timeout=None):
+        self.buffer.end()
+        self.buffer.wait_drained(timeout)
+        self.sink.stop()
+        self.stats = self.buffer.stats()
+        return self.stats
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.sink.stop()
+        return False
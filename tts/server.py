@@ -1,69 +1,228 @@
-import torch
-import torchaudio
+import os
+import time
 import numpy as np
 import base64
 import asyncio
-import re
+import traceback
 from fastapi import FastAPI, WebSocket
-from fastapi.responses import HTMLResponse
-from chatterbox.tts_turbo import ChatterboxTurboTTS
+from fastapi.responses import HTMLResponse, JSONResponse
+from chunking import AdaptiveChunker
+from workers import WorkerPool, WorkerDied, memory_usage
 
 app = FastAPI()
 
-print("Loading Chatterbox Turbo...")
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-model = ChatterboxTurboTTS.from_pretrained(device=DEVICE)
-
 REFERENCE_AUDIO_PATH = "/home/cloud/STT-Livekit-RTC/test_audio_2.wav" 
-print(f"Model loaded on {DEVICE}")
-
 
-def split_text(text):
+# Local checkpoint directory; when unset the weights come from the HF cache
+CHATTERBOX_CKPT_DIR = os.getenv("CHATTERBOX_CKPT_DIR")
+READY_FILE = os.getenv("READY_FILE")
+
+# TTS_WORKERS > 1 loads the weights once, then forks that many synthesis
+# workers sharing them copy-on-write. Threads per worker default to an even
+# split of the cores so workers don't oversubscribe them.
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "1"))
+TTS_THREADS_PER_WORKER = int(os.getenv("TTS_THREADS_PER_WORKER", "0")) or max(1, (os.cpu_count() or 1) // TTS_WORKERS)
+
+# Loaded in the background at startup so /ready can answer while it runs
+model = None
+pool = None
+model_ready = asyncio.Event()   # Also set when loading fails; check load_error
+load_error = None
+startup_timings = {}
+sentences_done = 0
+serving_since = None
+
+
+def load_model(warm_up=True):
+    global model
+    started = time.perf_counter()
+
+    t = time.perf_counter()
+    import torch
+    from chatterbox.tts_turbo import ChatterboxTurboTTS
+    startup_timings["import"] = time.perf_counter() - t
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"Loading Chatterbox Turbo on {device}...")
+    t = time.perf_counter()
+    if CHATTERBOX_CKPT_DIR:
+        model = ChatterboxTurboTTS.from_local(CHATTERBOX_CKPT_DIR, device)
+    else:
+        model = ChatterboxTurboTTS.from_pretrained(device=device)
+    startup_timings["load"] = time.perf_counter() - t
+
+    # One short synthesis so the first real request doesn't pay warm-up.
+    # Forked workers warm up themselves instead.
+    if warm_up:
+        t = time.perf_counter()
+        model.generate("Warming up.", audio_prompt_path=REFERENCE_AUDIO_PATH)
+        startup_timings["warm_up"] = time.perf_counter() - t
+
+    startup_timings["total"] = time.perf_counter() - started
+
+
+@app.on_event("startup")
+async def start_loading():
+    async def load():
+        global pool, serving_since, load_error
+        try:
+            await load_and_start_workers()
+        except Exception as e:
+            # Nothing awaits this task, so report here rather than lose it
+            load_error = f"{type(e).__name__}: {e}"
+            print(f"Model FAILED to load:\n{traceback.format_exc()}")
+            if pool is not None:
+                pool.close()
+                pool = None
+            model_ready.set()
+            return
+
+        serving_since = time.perf_counter()
+        model_ready.set()
+        if READY_FILE:
+            with open(READY_FILE, "w") as f:
+                f.write(f"{startup_timings['total']:.3f}\n")
+
+    async def load_and_start_workers():
+        global pool
+        started = time.perf_counter()
+        await asyncio.to_thread(load_model, TTS_WORKERS == 1)
+        if TTS_WORKERS > 1:
+            t = time.perf_counter()
+            pool = WorkerPool(model, TTS_WORKERS, TTS_THREADS_PER_WORKER, REFERENCE_AUDIO_PATH)
+            await pool.start()
+            startup_timings["fork_and_warm_up_workers"] = time.perf_counter() - t
+            startup_timings["total"] = time.perf_counter() - started
+
+        breakdown = ", ".join(f"{k}={v * 1000:.0f}ms" for k, v in startup_timings.items())
+        print(f"Model READY ({breakdown})")
+
+    asyncio.create_task(load())
+
+
+@app.get("/ready")
+async def ready():
+    if load_error is not None:
+        return JSONResponse({"ready": False, "error": load_error}, status_code=500)
+    if not model_ready.is_set():
+        return JSONResponse({"ready": False}, status_code=503)
+    return {"ready": True, "startup_seconds": startup_timings}
+
+
+@app.get("/stats")
+async def stats():
+    if not model_ready.is_set() or load_error is not None:
+        return JSONResponse({"ready": False, "error": load_error}, status_code=503)
+    if pool is not None:
+        return await pool.stats()
+    uptime = time.perf_counter() - serving_since
+    return {
+        "workers": [],
+        "parent": {k: round(v, 1) for k, v in memory_usage().items()},
+        "sentences_per_s": round(sentences_done / uptime, 2) if uptime else 0.0,
+    }
+
+
+@app.on_event("shutdown")
+async def stop_workers():
+    if pool is not None:
+        pool.close()
+
+# Synthesis seconds per word, smoothed across requests; sizes later chunks
+seconds_per_word = None
+
+
+def update_seconds_per_word(seconds, words):
+    global seconds_per_word
+    if words == 0:
+        return
+    sample = seconds / words
+    seconds_per_word = sample if seconds_per_word is None else 0.8 * seconds_per_word + 0.2 * sample
 
-    chunks = re.split(r'(?<=[.!?]) +', text)
-    return [c.strip() for c in chunks if c.strip()]
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    global sentences_done
     await websocket.accept()
-    
+    await model_ready.wait()
+    if load_error is not None:
+        await websocket.close(code=1011, reason="TTS model failed to load")
+        return
+
+    worker = None
     try:
+        # The whole session stays on the least-loaded worker
+        worker = pool.acquire() if pool is not None else None
+
         while True:
             
             data = await websocket.receive_text()
+            received_at = time.perf_counter()
             print(f"Received text: {data[:]}...")
 
-            sentences = split_text(data)
+            # Short first chunk for time-to-first-audio; later chunks grow
+            # with the audio the client already has buffered
+            chunker = AdaptiveChunker(data)
+            first_audio_at = None
+            audio_sent = 0.0
+            i = 0
 
-            for i, sentence in enumerate(sentences):
+            while not chunker.done:
+                buffered = 0.0
+                if first_audio_at is not None:
+                    buffered = max(0.0, audio_sent - (time.perf_counter() - first_audio_at))
+                chunk = chunker.next_chunk(buffered, seconds_per_word)
 
-                print(f"Generating chunk {i+1}/{len(sentences)}: {sentence[:]}...")
+                print(f"Generating chunk {i+1} ({len(chunk.split())} words, {buffered:.1f}s buffered): {chunk[:]}...")
                
-                wav_tensor = await asyncio.to_thread(
-                    model.generate, 
-                    sentence, 
-                    audio_prompt_path=REFERENCE_AUDIO_PATH
-                )
-
-                audio_data = wav_tensor.cpu().numpy().squeeze()
+                started = time.perf_counter()
+                if pool is not None:
+                    audio_data = await pool.generate(worker, chunk)
+                else:
+                    wav_tensor = await asyncio.to_thread(
+                        model.generate, 
+                        chunk, 
+                        audio_prompt_path=REFERENCE_AUDIO_PATH
+                    )
+                    audio_data = wav_tensor.cpu().numpy().squeeze()
+                update_seconds_per_word(time.perf_counter() - started, len(chunk.split()))
+                sentences_done += 1
 
                 audio_bytes = audio_data.astype(np.float32).tobytes()
      
                 encoded_audio = base64.b64encode(audio_bytes).decode('utf-8')
                 
-                await websocket.send_json({
+                message = {
                     "audio": encoded_audio,
                     "sample_rate": model.sr,
                     "chunk_id": i,
-                    "is_last": (i == len(sentences) - 1)
-                })
+                    "is_last": chunker.done
+                }
+                if first_audio_at is None:
+                    first_audio_at = time.perf_counter()
+                    message["ttfa_ms"] = round((first_audio_at - received_at) * 1000)
+                await websocket.send_json(message)
+
+                audio_sent += len(audio_data) / model.sr
+                i += 1
 
                 await asyncio.sleep(0.01)
 
-            print("Finished streaming response.")
+            ttfa = (first_audio_at - received_at) * 1000 if first_audio_at else 0.0
+            print(f"Finished streaming response. TTFA {ttfa:.0f}ms, chunk words {chunker.chunk_sizes}")
 
+    except WorkerDied as e:
+        # The pool respawns the worker; this session's client has to reconnect
+        print(f"Session lost its TTS worker: {e}")
+        try:
+            await websocket.close(code=1011, reason="TTS worker died")
+        except Exception:
+            pass
     except Exception as e:
         print(f"Connection closed or error: {e}")
+    finally:
+        if worker is not None:
+            pool.release(worker)
 
 
 @app.get("/")
@@ -0,0 +1,79 @@
+import random
+import time
+
+from playout import JitterBuffer, NullSink, Playout
+
+SAMPLE_RATE = 24000
+BYTES_PER_MS = SAMPLE_RATE * 2 // 1000
+
+
+def fake_chunks(total_ms=500, chunk_ms=40, jitter_ms=0, seed=0):
+    """Deterministic PCM chunks with their arrival time in seconds.
+
+    Chunks are produced in real time and each is delayed by up to
+    jitter_ms, in order (like a TCP stream); each byte pattern is unique
+    to its position.
+    """
+    rng = random.Random(seed)
+    arrival = 0.0
+    for start in range(0, total_ms, chunk_ms):
+        size = chunk_ms * BYTES_PER_MS
+        chunk = bytes((start * BYTES_PER_MS + i) % 251 + 1 for i in range(size))
+        arrival = max(arrival, (start + rng.uniform(0, jitter_ms)) / 1000)
+        yield chunk, arrival
+
+
+def test_null_sink_output_matches_input():
+    pushed = bytearray()
+    sink = NullSink(sample_rate=SAMPLE_RATE, realtime=False)
+    with Playout(sink, sample_rate=SAMPLE_RATE) as playout:
+        for chunk, _ in fake_chunks(total_ms=500):
+            pushed += chunk
+            playout.feed(chunk)
+
+    block_bytes = sink.frames_per_buffer * 2
+    assert sink.output[:len(pushed)] == pushed, "output differs from what was pushed"
+    assert len(sink.output) - len(pushed) < block_bytes, f"{len(sink.output) - len(pushed)} bytes of padding"
+    assert not any(sink.output[len(pushed):]), "padding isn't silence"
+    assert playout.stats["underruns"] == 0, playout.stats
+    print(f"null sink: {len(pushed)} bytes in, {len(sink.output)} out, {playout.stats}")
+
+
+def test_realtime_jitter_absorbed():
+    sink = NullSink(sample_rate=SAMPLE_RATE, realtime=True)
+    with Playout(sink, sample_rate=SAMPLE_RATE, min_depth_ms=80, max_depth_ms=1500) as playout:
+        started = time.monotonic()
+        for chunk, arrival in fake_chunks(total_ms=2000, jitter_ms=60, seed=1):
+            time.sleep(max(0.0, started + arrival - time.monotonic()))
+            playout.feed(chunk)
+    assert playout.stats["underruns"] == 0, playout.stats
+    # Late arrivals raised the target above the floor, but nowhere near the cap
+    assert 80 < playout.stats["target_depth_ms"] < 300, playout.stats
+    print(f"realtime, 60ms jitter: {playout.stats}")
+
+
+def test_burst_adds_no_jitter():
+    # A source running ahead of real time delivers everything at once
+    buffer = JitterBuffer(sample_rate=SAMPLE_RATE)
+    for chunk, _ in fake_chunks(total_ms=1000):
+        buffer.push(chunk, now=0.0)
+    assert buffer.jitter_ms == 0.0, buffer.stats()
+    assert buffer.target_depth_ms == buffer.min_depth_ms, buffer.stats()
+
+
+def test_underrun_counted():
+    buffer = JitterBuffer(sample_rate=SAMPLE_RATE, min_depth_ms=20)
+    buffer.push(b"\x01\x00" * (40 * SAMPLE_RATE // 1000), now=0.0)
+    buffer.read(30 * BYTES_PER_MS)
+    buffer.read(30 * BYTES_PER_MS)
+    assert buffer.underruns == 1, buffer.stats()
+    buffer.end()
+    assert buffer.wait_drained(0), "buffer should be drained after end()"
+
+
+if __name__ == "__main__":
+    test_null_sink_output_matches_input()
+    test_underrun_counted()
+    test_burst_adds_no_jitter()
+    test_realtime_jitter_absorbed()
+    print("OK")
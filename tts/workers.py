@@ -0,0 +1,291 @@
+import asyncio
+import gc
+import itertools
+import multiprocessing
+import threading
+import time
+import traceback
+
+import numpy as np
+
+
+def memory_usage():
+    """RSS and PSS in MB. PSS splits shared pages between the processes mapping
+    them, so summing PSS across workers shows what the pool really costs."""
+    usage = {"rss_mb": 0.0, "pss_mb": 0.0}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    usage["rss_mb"] = int(line.split()[1]) / 1024
+                elif line.startswith("Pss:"):
+                    usage["pss_mb"] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return usage
+
+
+def _worker_main(model, conn, index, threads, audio_prompt_path):
+    """Runs in a forked child: the model's weights are the parent's pages."""
+    import torch
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+    # Warm up here, not in the parent: the parent must not start its
+    # intra-op thread pool before forking
+    try:
+        model.generate("Warming up.", audio_prompt_path=audio_prompt_path)
+    except Exception:
+        conn.send(("failed", index, traceback.format_exc()))
+        return
+    conn.send(("ready", index, memory_usage()))
+
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        kind, job_id, payload = message
+        if kind == "stats":
+            conn.send(("stats", job_id, memory_usage()))
+            continue
+        try:
+            started = time.perf_counter()
+            wav_tensor = model.generate(payload, audio_prompt_path=audio_prompt_path)
+            audio = wav_tensor.cpu().numpy().squeeze().astype(np.float32)
+            conn.send(("audio", job_id, (audio.tobytes(), time.perf_counter() - started)))
+        except Exception as e:
+            conn.send(("error", job_id, str(e)))
+
+
+class WorkerDied(RuntimeError):
+    """The worker process exited; its pending and future requests fail with this."""
+
+
+class Worker:
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.alive = True
+        self.on_exit = None
+        self.sessions = 0
+        self.inflight = 0
+        self.completed = 0
+        self.busy_seconds = 0.0
+        self.memory = {}
+        self.ready = None
+        self._futures = {}
+        self._send_lock = threading.Lock()
+
+    @property
+    def serving(self):
+        return self.alive and self.ready.done() and self.ready.exception() is None
+
+    def request(self, loop, kind, job_id, payload=None):
+        future = loop.create_future()
+        if not self.alive:
+            future.set_exception(WorkerDied(f"TTS worker {self.index} is not running"))
+            return future
+        self._futures[job_id] = future
+        try:
+            with self._send_lock:
+                self.conn.send((kind, job_id, payload))
+        except OSError:
+            # The read loop will notice the closed pipe and fail everything else
+            self._futures.pop(job_id, None)
+            future.set_exception(WorkerDied(f"TTS worker {self.index} is not running"))
+        return future
+
+    def read_loop(self, loop):
+        # Dedicated thread: blocking recv() on the pipe, results handed to the loop
+        while True:
+            try:
+                kind, job_id, payload = self.conn.recv()
+            except (EOFError, OSError):
+                # Reap it here rather than on the loop, so exitcode is set
+                self.process.join(timeout=1)
+                loop.call_soon_threadsafe(self._exited)
+                return
+            loop.call_soon_threadsafe(self._resolve, kind, job_id, payload)
+
+    def _exited(self):
+        self.alive = False
+        error = WorkerDied(f"TTS worker {self.index} (pid {self.process.pid}) exited with code {self.process.exitcode}")
+        if not self.ready.done():
+            self.ready.set_exception(error)
+        futures, self._futures = self._futures, {}
+        for future in futures.values():
+            if not future.done():
+                future.set_exception(error)
+        if self.on_exit is not None:
+            self.on_exit(self)
+
+    def _resolve(self, kind, job_id, payload):
+        if kind == "ready":
+            self.memory = payload
+            self.ready.set_result(True)
+            return
+        if kind == "failed":
+            self.ready.set_exception(RuntimeError(f"TTS worker {self.index} failed to warm up:\n{payload}"))
+            return
+        future = self._futures.pop(job_id, None)
+        if future is None or future.done():
+            return
+        if kind == "error":
+            future.set_exception(RuntimeError(payload))
+        else:
+            future.set_result(payload)
+
+
+class WorkerPool:
+    """N forked synthesis workers sharing one copy of the model weights.
+
+    The parent loads the model once and forks; the weight tensors are never
+    written, so their pages stay shared copy-on-write. Each WebSocket
+    session is pinned to the least-loaded worker for its lifetime.
+
+    A worker that dies fails its pending requests with WorkerDied (so its
+    sessions error out instead of hanging), stops getting new sessions and
+    is forked again after `respawn_delay` seconds. A replacement that dies
+    before it has warmed up is not forked again; its index is recorded in
+    `failed` and the pool runs one worker short.
+    """
+
+    def __init__(self, model, workers, threads_per_worker, audio_prompt_path, respawn_delay=1.0):
+        self.model = model
+        self.size = workers
+        self.threads_per_worker = threads_per_worker
+        self.audio_prompt_path = audio_prompt_path
+        self.respawn_delay = respawn_delay
+        self.workers = []
+        self._job_ids = itertools.count()
+        self._closing = False
+        self.started_at = None
+        self.respawns = 0
+        self.failed = set()
+
+    def _spawn(self, index):
+        loop = asyncio.get_running_loop()
+        ctx = multiprocessing.get_context("fork")
+        parent_conn, child_conn = ctx.Pipe()
+        process = ctx.Process(
+            target=_worker_main,
+            args=(self.model, child_conn, index, self.threads_per_worker, self.audio_prompt_path),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+
+        worker = Worker(index, process, parent_conn)
+        worker.ready = loop.create_future()
+        worker.on_exit = self._worker_exited
+        threading.Thread(target=worker.read_loop, args=(loop,), daemon=True).start()
+        return worker
+
+    async def start(self):
+        # Keep the GC from touching (and so un-sharing) the parent's objects
+        gc.freeze()
+        self.workers = [self._spawn(index) for index in range(self.size)]
+        try:
+            await asyncio.gather(*(w.ready for w in self.workers))
+        except Exception:
+            self.close()
+            raise
+        self.started_at = time.perf_counter()
+        print(f"{self.size} TTS workers ready ({self.threads_per_worker} threads each)")
+
+    def _worker_exited(self, worker):
+        if self._closing or self.started_at is None:
+            return
+        if worker.ready.exception() is not None:
+            # Never served: respawning would fail the same way, forever
+            self.failed.add(worker.index)
+            print(f"TTS worker {worker.index} exited before warming up; not respawning it")
+            return
+        print(f"TTS worker {worker.index} (pid {worker.process.pid}) died with exit code {worker.process.exitcode}; respawning")
+        asyncio.get_running_loop().create_task(self._respawn(worker.index))
+
+    async def _respawn(self, index):
+        await asyncio.sleep(self.respawn_delay)
+        if self._closing:
+            return
+        worker = self._spawn(index)
+        self.workers[index] = worker
+        try:
+            await worker.ready
+        except Exception as e:
+            # _worker_exited() sees it never warmed up and leaves the index dead
+            print(f"TTS worker {index} could not be respawned: {e}")
+            return
+        self.respawns += 1
+        print(f"TTS worker {index} respawned (pid {worker.process.pid})")
+
+    def acquire(self):
+        serving = [w for w in self.workers if w.serving]
+        if not serving:
+            raise WorkerDied("No TTS worker is running")
+        worker = min(serving, key=lambda w: (w.sessions, w.inflight))
+        worker.sessions += 1
+        return worker
+
+    def release(self, worker):
+        worker.sessions -= 1
+
+    async def generate(self, worker, text):
+        loop = asyncio.get_running_loop()
+        worker.inflight += 1
+        try:
+            audio_bytes, seconds = await worker.request(loop, "generate", next(self._job_ids), text)
+        finally:
+            worker.inflight -= 1
+        worker.completed += 1
+        worker.busy_seconds += seconds
+        return np.frombuffer(audio_bytes, dtype=np.float32)
+
+    async def stats(self):
+        loop = asyncio.get_running_loop()
+        serving = [w for w in self.workers if w.serving]
+        replies = await asyncio.gather(
+            *(w.request(loop, "stats", next(self._job_ids)) for w in serving),
+            return_exceptions=True,
+        )
+        # Dead or still-starting workers report no memory
+        by_worker = dict(zip(serving, replies))
+        memory = [
+            by_worker[w] if isinstance(by_worker.get(w), dict) else {"rss_mb": 0.0, "pss_mb": 0.0}
+            for w in self.workers
+        ]
+        uptime = time.perf_counter() - self.started_at if self.started_at else 0.0
+        completed = sum(w.completed for w in self.workers)
+        return {
+            "workers": [
+                {
+                    "index": w.index,
+                    "pid": w.process.pid,
+                    "alive": w.alive,
+                    "sessions": w.sessions,
+                    "inflight": w.inflight,
+                    "sentences": w.completed,
+                    "busy_s": round(w.busy_seconds, 1),
+                    "rss_mb": round(mem["rss_mb"], 1),
+                    "pss_mb": round(mem["pss_mb"], 1),
+                }
+                for w, mem in zip(self.workers, memory)
+            ],
+            "parent": {k: round(v, 1) for k, v in memory_usage().items()},
+            "total_pss_mb": round(sum(m["pss_mb"] for m in memory), 1),
+            "respawns": self.respawns,
+            "failed": sorted(self.failed),
+            "sentences_per_s": round(completed / uptime, 2) if uptime else 0.0,
+        }
+
+    def close(self):
+        self._closing = True
+        for worker in self.workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self.workers:
+            worker.process.join(timeout=5)